@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Optional, Union
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import BotCommand
+from aiohttp import web
+from loguru import logger
+
+from config import (
+    BOT_TOKEN,
+    DB_URL,
+    RUN_MODE,
+    TELEGRAM_API_URL,
+    WEB_PORT,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+)
+from core.db.database_handler import DatabaseHandler
+from core.services.app_config import app_config
+from core.services.check_jobs import RemoteChecker
+from core.utils.logs import setup_logging
+from core.utils.web import create_web_app, start_web_app, wait_for_shutdown
+from routers import commands
+
+if TYPE_CHECKING:
+    from core.services.checker import Checker
+
+BOT_COMMANDS = [
+    BotCommand(command="/start", description="Запуск / перезапуск бота 🚀"),
+]
+
+
+async def set_bot_commands(bot: Bot) -> None:
+    try:
+        await bot.set_my_commands(BOT_COMMANDS)
+        logger.info("Bot commands set")
+    except Exception as e:
+        logger.warning(f"Failed to set bot commands: {e}")
+
+
+async def run_bot(db: DatabaseHandler, checker: Union[Checker, RemoteChecker]) -> None:
+    """
+    Serve Telegram updates by polling or webhook until shutdown. Nothing
+    waits for Telegram before serving: the command menu is set in the
+    background and start_polling looks the bot up itself.
+    """
+    if RUN_MODE == "webhook" and not WEBHOOK_BASE_URL:
+        raise ValueError("WEBHOOK_BASE_URL is required in webhook mode")
+
+    dp = Dispatcher()
+    api = TelegramAPIServer.from_base(TELEGRAM_API_URL)
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=api))
+
+    dp["db"] = db
+    dp["checker"] = checker
+    dp.include_routers(
+        commands.router,
+    )
+
+    commands_task = asyncio.create_task(set_bot_commands(bot))
+    # Checker metrics are only known where the checker runs
+    local_checker = None if isinstance(checker, RemoteChecker) else checker
+    runner: Optional[web.AppRunner] = None
+    try:
+        if RUN_MODE == "webhook":
+            app = create_web_app(
+                db, local_checker, dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET
+            )
+            runner = await start_web_app(app)
+            await bot.set_webhook(
+                f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info("Webhook set")
+            await wait_for_shutdown()
+        else:
+            # Telegram refuses getUpdates while a webhook is set
+            await bot.delete_webhook()
+            if WEB_PORT:
+                runner = await start_web_app(create_web_app(db, local_checker))
+            await dp.start_polling(bot)
+    finally:
+        commands_task.cancel()
+        if runner is not None:
+            await runner.cleanup()
+
+
+async def main() -> None:
+    """Bot process without the checker; on-demand checks go to check_jobs."""
+    setup_logging()
+    logger.info(f"Starting bot process in {RUN_MODE} mode")
+
+    db = DatabaseHandler(DB_URL)
+    await db.init()
+    await app_config.start(db)
+    checker = RemoteChecker(db)
+    try:
+        await run_bot(db, checker)
+    finally:
+        await checker.close()
+        await app_config.stop()
+        await db.close()
+        # Flush the queued log records
+        await logger.complete()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
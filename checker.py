@@ -0,0 +1,67 @@
+import asyncio
+from typing import Optional
+
+from aiohttp import web
+from loguru import logger
+
+from config import DB_URL, PARSE_WORKERS, STATE_SNAPSHOT_PATH, WARM_STATE_PATH, WEB_PORT
+from core.db.database_handler import DatabaseHandler
+from core.services.app_config import app_config
+from core.services.check_jobs import CheckJobWorker
+from core.services.checker import Checker
+from core.services.community_crawler import CommunityCrawler
+from core.services.tweet_state import TweetStateStore
+from core.services.warm_state import WarmState
+from core.utils.cassette import install_from_config
+from core.utils.logs import setup_logging
+from core.utils.scheduler import scheduler
+from core.utils.x_community_checker import start_parse_pool, stop_parse_pool
+from core.utils.web import create_web_app, start_web_app, wait_for_shutdown
+
+
+async def main() -> None:
+    """Checker process: the periodic sweep plus on-demand jobs from the bot."""
+    setup_logging()
+    logger.info("Starting checker process")
+
+    db = DatabaseHandler(DB_URL)
+    await db.init()
+    await app_config.start(db)
+
+    state_store = TweetStateStore(STATE_SNAPSHOT_PATH)
+    state_store.load()
+    cassette = install_from_config()
+    start_parse_pool(PARSE_WORKERS)
+    checker = Checker(db, state_store)
+    crawler = CommunityCrawler(db, checker.engine)
+    warm_state = WarmState(WARM_STATE_PATH)
+    warm_state.load(checker, crawler)
+    # Polling and the first sweep do not wait for the session and token
+    warmup = asyncio.create_task(checker.engine.warm())
+    worker = CheckJobWorker(db, checker)
+    runner: Optional[web.AppRunner] = None
+    try:
+        scheduler.start(checker, crawler)
+        await worker.start()
+        if WEB_PORT:
+            runner = await start_web_app(create_web_app(db, checker))
+        await wait_for_shutdown()
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        await worker.stop()
+        warmup.cancel()
+        await scheduler.stop()
+        await checker.close()
+        await warm_state.save(checker, crawler)
+        stop_parse_pool()
+        if cassette is not None:
+            cassette.close()
+        await app_config.stop()
+        await db.close()
+        # Flush the queued log records
+        await logger.complete()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
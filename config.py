@@ -13,3 +13,80 @@ DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_PORT = os.getenv("POSTGRES_PORT")
 DB_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Optional path of the JSON snapshot with the last known tweet states
+STATE_SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH")
+
+# Optional path of the JSON snapshot that makes checker restarts warm:
+# guest token, queued digest events, schedule and growth history
+WARM_STATE_PATH = os.getenv("WARM_STATE_PATH")
+# Seconds shutdown waits for a running sweep and on-demand checks
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))
+
+# Telegram IDs allowed to change quotas with /quota and to /export the stats
+# history of all users, comma-separated. Every invited user has access to
+# the bot, so access alone is not enough
+OPERATOR_IDS = {
+    int(user_id)
+    for user_id in os.getenv("OPERATOR_IDS", "").split(",")
+    if user_id.strip()
+}
+
+# Seconds a user record stays in the in-process cache
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+# Cache of guest tokens and fetch results, see core/utils/cache.py: unset
+# keeps it in the process, redis://host:6379/0 shares it between checker
+# nodes (needs the optional redis package)
+CACHE_URL = os.getenv("CACHE_URL")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "x_post_checker:")
+
+# Base URLs of the X and Telegram APIs; the soak test points them at local
+# fakes, see core/utils/soak.py
+X_API_URL = os.getenv("X_API_URL", "https://api.x.com").rstrip("/")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+
+# "polling" (default) or "webhook"
+RUN_MODE = os.getenv("RUN_MODE", "polling").lower()
+
+# aiohttp app with the webhook, /healthz and /metrics; in polling mode it is
+# only started when WEB_PORT is set explicitly
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = os.getenv("WEB_PORT")
+
+# Public base URL Telegram posts updates to, e.g. https://bot.example.com
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+# Processes that decode large community timelines off the event loop, 0 = inline
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+
+# Record/replay of X and Telegram HTTP calls: "record", "replay" or unset
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "").lower() or None
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassette.cas")
+# Replay at recorded latency divided by this factor, 0 answers at once
+CASSETTE_SPEED = float(os.getenv("CASSETTE_SPEED", "0"))
+# Replayed requests served at a time, 0 = unlimited
+CASSETTE_CONCURRENCY = int(os.getenv("CASSETTE_CONCURRENCY", "0"))
+
+# Slow tick profiles, see core/utils/profiling.py
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+# "cprofile" or "yappi" (optional, not in requirements.txt)
+PROFILER = os.getenv("PROFILER", "cprofile").lower()
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for loguru's readable format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Per-event sampling rates, e.g. "tweet_transition=0.1,timeline_parse_error=0.01"
+LOG_SAMPLE = os.getenv("LOG_SAMPLE")
+
+# Samples kept per tweet for growth alerts; memory is about 48 bytes per
+# sample and tracked tweet
+GROWTH_WINDOW = int(os.getenv("GROWTH_WINDOW", "30"))
@@ -1,19 +1,44 @@
 from __future__ import annotations
 
-from typing import Any, Optional, Sequence, List
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional, Sequence, List, Set, Tuple
 
-from sqlalchemy import delete, select, update, insert
+from sqlalchemy import Integer, cast, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
 )
+from sqlalchemy.orm import selectinload
 
-from core.db.base import Base
+from config import USER_CACHE_TTL
 from core.db.tables import (
     User,
     AppConfig,
     Tweet,
+    Subscription,
+    CheckJob,
+    CheckJobStatus,
+    CommunityTimelineEntry,
+    CommunityCrawlCheckpoint,
+    AlertRule,
+    TweetStatsSample,
 )
+from core.utils.cache import TTLCache
+
+# Postgres channel notified with the unique_name of every changed config
+CONFIG_CHANNEL = "app_config"
+# Postgres channel notified with the id of every new check job
+CHECK_JOBS_CHANNEL = "check_jobs"
+# Postgres channel notified with comma-separated ids of changed tweet rows,
+# or TWEETS_RELOAD when too much changed to list
+TWEETS_CHANNEL = "tweets"
+TWEETS_RELOAD = "*"
+# Tweet ids per NOTIFY, payloads must stay below 8000 bytes
+NOTIFY_BATCH_SIZE = 500
+# Rows per multi-row INSERT/UPDATE, keeps statements below asyncpg's
+# 32767 bind parameter limit
+BULK_BATCH_SIZE = 1000
 
 
 class DatabaseHandler:
@@ -27,16 +52,40 @@ class DatabaseHandler:
         self.sessionmaker = async_sessionmaker(
             self.engine, autoflush=False, autocommit=False, expire_on_commit=False
         )
+        self.user_cache: TTLCache[int, User] = TTLCache(ttl=USER_CACHE_TTL)
 
     async def init(self) -> None:
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        """Bring the schema up to date; alembic is only loaded here."""
+        from core.db.migrate import upgrade_database
+
+        await upgrade_database(self.engine)
 
     async def close(self) -> None:
         await self.engine.dispose()
 
+    async def ping(self) -> None:
+        """Raise if the database cannot run a trivial query."""
+        async with self.engine.connect() as conn:
+            await conn.execute(select(1))
+
     # ==================== USER OPERATIONS ====================
 
+    @staticmethod
+    def _profile_changes(
+        user: User,
+        first_name: Optional[str],
+        last_name: Optional[str],
+        username: Optional[str],
+    ) -> dict:
+        changes = {}
+        if username and user.username != username:
+            changes["username"] = username
+        if first_name and user.first_name != first_name:
+            changes["first_name"] = first_name
+        if last_name and user.last_name != last_name:
+            changes["last_name"] = last_name
+        return changes
+
     async def create_or_get_user(
         self,
         user_tg_id: int,
@@ -45,6 +94,14 @@ class DatabaseHandler:
         username: Optional[str] = None,
         language: Optional[str] = "ru",
     ) -> User:
+        """
+        Served from the user cache when the profile is unchanged; the DB is
+        only written when the user is new or a profile field changed.
+        """
+        user = self.user_cache.get(user_tg_id)
+        if user and not self._profile_changes(user, first_name, last_name, username):
+            return user
+
         async with self.sessionmaker() as session:
             result = await session.execute(
                 select(User).where(User.user_tg_id == user_tg_id)
@@ -53,13 +110,13 @@ class DatabaseHandler:
 
             if user:
                 # Обновляем данные если изменились
-                if username and user.username != username:
-                    user.username = username
-                if first_name and user.first_name != first_name:
-                    user.first_name = first_name
-                if last_name and user.last_name != last_name:
-                    user.last_name = last_name
-                await session.commit()
+                changes = self._profile_changes(user, first_name, last_name, username)
+                if changes:
+                    for key, value in changes.items():
+                        setattr(user, key, value)
+                    await session.commit()
+                    await session.refresh(user)
+                self.user_cache.set(user_tg_id, user)
                 return user
 
             # Создаем нового пользователя
@@ -73,16 +130,27 @@ class DatabaseHandler:
             session.add(user)
             await session.commit()
             await session.refresh(user)
+            self.user_cache.set(user_tg_id, user)
             return user
 
-    async def get_user(self, user_tg_id: int) -> Optional[User]:
+    async def _load_user(self, user_tg_id: int) -> Optional[User]:
         async with self.sessionmaker() as session:
             result = await session.execute(
                 select(User).where(User.user_tg_id == user_tg_id)
             )
             return result.scalar_one_or_none()
 
+    async def get_user(self, user_tg_id: int) -> Optional[User]:
+        return await self.user_cache.get_or_load(
+            user_tg_id, lambda: self._load_user(user_tg_id)
+        )
+
+    async def has_access(self, user_tg_id: int) -> bool:
+        user = await self.get_user(user_tg_id)
+        return user is not None and user.is_admin and not user.is_banned
+
     async def update_user(self, user_tg_id: int, **kwargs: Any) -> Optional[User]:
+        self.user_cache.invalidate(user_tg_id)
         async with self.sessionmaker() as session:
             async with session.begin():
                 result = await session.execute(
@@ -96,14 +164,20 @@ class DatabaseHandler:
                     if hasattr(user, key):
                         setattr(user, key, value)
 
+            await session.refresh(user)
+            self.user_cache.set(user_tg_id, user)
             return user
 
     async def delete_user(self, user_tg_id: int) -> bool:
+        self.user_cache.invalidate(user_tg_id)
         async with self.sessionmaker() as session:
             async with session.begin():
                 result = await session.execute(
                     delete(User).where(User.user_tg_id == user_tg_id)
                 )
+                await session.execute(
+                    select(func.pg_notify(TWEETS_CHANNEL, TWEETS_RELOAD))
+                )
                 return True
 
     async def ban_user(self, user_tg_id: int) -> bool:
@@ -123,6 +197,50 @@ class DatabaseHandler:
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    async def get_quota_users(self) -> List[User]:
+        """Users whose sweep schedule differs from the default."""
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(User).where(
+                    or_(
+                        User.check_interval_seconds.is_not(None),
+                        User.fetch_weight != 1,
+                    )
+                )
+            )
+            return result.scalars().all()
+
+    async def get_digest_user_ids(self) -> Set[int]:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(User.user_tg_id).where(User.digest_interval_minutes.is_not(None))
+            )
+            return set(result.scalars().all())
+
+    async def get_due_digest_user_ids(self) -> List[int]:
+        """Digest users whose interval has passed since their last digest."""
+        interval = func.make_interval(0, 0, 0, 0, 0, User.digest_interval_minutes)
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(User.user_tg_id).where(
+                    User.digest_interval_minutes.is_not(None),
+                    or_(
+                        User.digest_sent_at.is_(None),
+                        User.digest_sent_at + interval <= func.now(),
+                    ),
+                )
+            )
+            return result.scalars().all()
+
+    async def mark_digest_sent(self, user_tg_ids: Sequence[int]) -> None:
+        async with self.sessionmaker() as session:
+            await session.execute(
+                update(User)
+                .where(User.user_tg_id.in_(user_tg_ids))
+                .values(digest_sent_at=func.now())
+            )
+            await session.commit()
+
     # ==================== APP CONFIG OPERATIONS ====================
 
     async def get_config(self, unique_name: str) -> Optional[Any]:
@@ -169,35 +287,114 @@ class DatabaseHandler:
                     )
                     session.add(config)
 
-                await session.commit()
-                await session.refresh(config)
-                return config
+                await session.execute(
+                    select(func.pg_notify(CONFIG_CHANNEL, unique_name))
+                )
+
+            await session.refresh(config)
+            return config
+
+    # ==================== TWEET OPERATIONS ====================
+
+    async def _notify_tweets(self, session, tweet_pks: Iterable[int]) -> None:
+        """
+        Tell ActiveTweetIndex listeners which tweet rows changed, delivered
+        when the session's transaction commits.
+        """
+        for batch in _batches(sorted(set(tweet_pks)), NOTIFY_BATCH_SIZE):
+            await session.execute(
+                select(func.pg_notify(TWEETS_CHANNEL, ",".join(map(str, batch))))
+            )
 
-    async def get_all_active_tweets(self) -> List[Tweet]:
+    async def get_all_active_tweets(
+        self,
+        tweet_ids: Optional[Sequence[str]] = None,
+        tweet_pks: Optional[Sequence[int]] = None,
+    ) -> List[Tweet]:
+        """
+        Return tracked tweets that have at least one active subscription,
+        with those subscriptions loaded. tweet_ids or tweet_pks narrow the
+        result down.
+        """
+        active_subscriptions = Tweet.subscriptions.and_(Subscription.is_active == True)
+        stmt = (
+            select(Tweet)
+            .where(
+                Tweet.is_active == True,
+                Tweet.subscriptions.any(Subscription.is_active == True),
+            )
+            .options(selectinload(active_subscriptions))
+        )
+        if tweet_ids is not None:
+            stmt = stmt.where(Tweet.tweet_id.in_(tweet_ids))
+        if tweet_pks is not None:
+            stmt = stmt.where(Tweet.id.in_(tweet_pks))
         async with self.sessionmaker() as session:
-            result = await session.execute(select(Tweet).where(Tweet.is_active == True))
+            result = await session.execute(stmt)
             return result.scalars().all()
 
+    async def get_active_tweets_checksum(self) -> Optional[str]:
+        """
+        md5 of every active subscription with its tweet and on_top flag,
+        see ActiveTweetIndex.checksum(); None if nothing is tracked.
+        """
+        row = func.concat_ws(
+            ":", Subscription.id, Tweet.id, cast(Tweet.on_top, Integer)
+        )
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(
+                    func.md5(
+                        func.string_agg(row, aggregate_order_by(",", Subscription.id))
+                    )
+                )
+                .select_from(Subscription)
+                .join(Tweet, Subscription.tweet_pk == Tweet.id)
+                .where(Subscription.is_active == True, Tweet.is_active == True)
+            )
+            return result.scalar_one()
+
     async def set_on_top_status(self, tweet_id: str, community_id: str, status: bool):
         async with self.sessionmaker() as session:
-            await session.execute(
+            result = await session.execute(
                 update(Tweet)
                 .where(Tweet.tweet_id == tweet_id, Tweet.community_id == community_id)
                 .values(on_top=status)
+                .returning(Tweet.id)
             )
+            await self._notify_tweets(session, result.scalars().all())
             await session.commit()
             return True
 
     async def set_as_inactive(
         self, tweet_id: str, status: bool = False, user_id: Optional[int] = None
     ):
+        """
+        Without user_id the tweet itself is marked as (in)active, e.g. when it
+        was deleted on X. With user_id only that user's subscription changes.
+        """
         async with self.sessionmaker() as session:
-            stmt = (
-                update(Tweet).where(Tweet.tweet_id == tweet_id).values(is_active=status)
-            )
             if user_id:
-                stmt = stmt.where(Tweet.user_id == user_id)
-            await session.execute(stmt)
+                stmt = (
+                    update(Subscription)
+                    .where(
+                        Subscription.user_id == user_id,
+                        Subscription.tweet_pk.in_(
+                            select(Tweet.id).where(Tweet.tweet_id == tweet_id)
+                        ),
+                    )
+                    .values(is_active=status)
+                    .returning(Subscription.tweet_pk)
+                )
+            else:
+                stmt = (
+                    update(Tweet)
+                    .where(Tweet.tweet_id == tweet_id)
+                    .values(is_active=status)
+                    .returning(Tweet.id)
+                )
+            result = await session.execute(stmt)
+            await self._notify_tweets(session, result.scalars().all())
             await session.commit()
             return True
 
@@ -208,14 +405,436 @@ class DatabaseHandler:
         user_id: int,
         community_id: Optional[str] = None,
     ):
+        await self.add_tweets(user_id, [(tweet_url, tweet_id, community_id)])
+        return True
+
+    async def add_tweets(
+        self,
+        user_id: int,
+        links: Sequence[Tuple[str, str, Optional[str]]],
+        limit: Optional[int] = None,
+    ) -> Tuple[int, int, List[str]]:
+        """
+        Subscribe a user to many (tweet_url, tweet_id, community_id) links with
+        one multi-row upsert per batch. Tweet rows are shared between all
+        subscribers and are reactivated if they were tracked before.
+
+        With a limit the user tracks at most that many tweets afterwards and
+        links past it are skipped. Returns how many subscriptions were
+        created or reactivated, how many links were skipped (the rest were
+        already active) and the tweet_ids the user now tracks of the links.
+        """
+        # A row may only be upserted once per statement
+        unique_links = {
+            (tweet_id, community_id): tweet_url
+            for tweet_url, tweet_id, community_id in links
+        }
+
+        added = 0
+        skipped = 0
+        async with self.sessionmaker() as session:
+            if limit is not None:
+                # Concurrent /add calls of one user wait here for each other
+                await session.execute(
+                    select(User.id).where(User.user_tg_id == user_id).with_for_update()
+                )
+                tracked = set(await self._tracked_links(session, user_id))
+                new = [key for key in unique_links if key not in tracked]
+                allowed = max(0, limit - len(tracked))
+                skipped = len(new[allowed:])
+                for key in new[allowed:]:
+                    del unique_links[key]
+            rows = [
+                {
+                    "tweet_url": tweet_url,
+                    "tweet_id": tweet_id,
+                    "community_id": community_id,
+                }
+                for (tweet_id, community_id), tweet_url in unique_links.items()
+            ]
+            for batch in _batches(rows):
+                result = await session.execute(
+                    insert(Tweet)
+                    .values(batch)
+                    .on_conflict_do_update(
+                        constraint="uq_tweets_tweet_id_community_id",
+                        set_={"is_active": True},
+                    )
+                    .returning(Tweet.id)
+                )
+                tweet_pks = result.scalars().all()
+                result = await session.execute(
+                    insert(Subscription)
+                    .values([{"user_id": user_id, "tweet_pk": pk} for pk in tweet_pks])
+                    .on_conflict_do_update(
+                        constraint="uq_subscriptions_user_tweet",
+                        set_={"is_active": True},
+                        where=Subscription.is_active == False,
+                    )
+                    .returning(Subscription.id)
+                )
+                added += len(result.all())
+                await self._notify_tweets(session, tweet_pks)
+            await session.commit()
+        accepted = list(dict.fromkeys(tweet_id for tweet_id, _ in unique_links))
+        return added, skipped, accepted
+
+    @staticmethod
+    def _tracked_links_query(user_id: int, *columns):
+        """Tweets the user has an active subscription to, deleted ones aside."""
+        return (
+            select(*columns)
+            .join(Subscription, Subscription.tweet_pk == Tweet.id)
+            .where(
+                Subscription.user_id == user_id,
+                Subscription.is_active == True,
+                Tweet.is_active == True,
+            )
+        )
+
+    async def _tracked_links(
+        self, session, user_id: int
+    ) -> List[Tuple[str, Optional[str]]]:
+        result = await session.execute(
+            self._tracked_links_query(user_id, Tweet.tweet_id, Tweet.community_id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def count_tracked_tweets(self, user_id: int) -> int:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                self._tracked_links_query(user_id, func.count(Tweet.id))
+            )
+            return result.scalar_one()
+
+    async def remove_tweets(self, user_id: int, tweet_ids: Sequence[str]) -> int:
+        """
+        Deactivate the user's subscriptions to tweet_ids, returns how many of
+        the tweets were tracked. A tweet may have several subscription rows.
+        """
+        removed: Set[str] = set()
+        async with self.sessionmaker() as session:
+            for batch in _batches(list(dict.fromkeys(tweet_ids))):
+                result = await session.execute(
+                    update(Subscription)
+                    .where(
+                        Subscription.user_id == user_id,
+                        Subscription.is_active == True,
+                        Subscription.tweet_pk == Tweet.id,
+                        Tweet.tweet_id.in_(batch),
+                    )
+                    .values(is_active=False)
+                    .returning(Subscription.tweet_pk, Tweet.tweet_id)
+                )
+                rows = result.all()
+                removed.update(tweet_id for _, tweet_id in rows)
+                await self._notify_tweets(session, (tweet_pk for tweet_pk, _ in rows))
+            await session.commit()
+        return len(removed)
+
+    async def get_tracked_community_ids(self) -> List[str]:
+        """Communities of tracked tweets that have an active subscription."""
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(Tweet.community_id)
+                .where(
+                    Tweet.is_active == True,
+                    Tweet.community_id.is_not(None),
+                    Tweet.subscriptions.any(Subscription.is_active == True),
+                )
+                .distinct()
+            )
+            return result.scalars().all()
+
+    # ==================== STATS HISTORY OPERATIONS ====================
+
+    async def add_stats_history(self, samples: Sequence[dict]) -> None:
+        """Insert TweetStatsSample rows; one sweep shares one observed_at."""
+        async with self.sessionmaker() as session:
+            for batch in _batches(samples):
+                await session.execute(insert(TweetStatsSample).values(batch))
+            await session.commit()
+
+    async def get_stats_history_range(self) -> Optional[Tuple[datetime, datetime]]:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(
+                    func.min(TweetStatsSample.observed_at),
+                    func.max(TweetStatsSample.observed_at),
+                )
+            )
+            first, last = result.one()
+            return None if first is None else (first, last)
+
+    # ==================== ALERT RULE OPERATIONS ====================
+
+    async def add_alert_rule(
+        self,
+        user_id: int,
+        metric: str,
+        threshold: int,
+        window_minutes: Optional[int] = None,
+    ) -> AlertRule:
+        async with self.sessionmaker() as session:
+            rule = AlertRule(
+                user_id=user_id,
+                metric=metric,
+                threshold=threshold,
+                window_minutes=window_minutes,
+            )
+            session.add(rule)
+            await session.commit()
+            await session.refresh(rule)
+            return rule
+
+    async def get_alert_rules(self, user_id: Optional[int] = None) -> List[AlertRule]:
+        """Rules of one user, or of all users that are not banned."""
+        stmt = select(AlertRule).order_by(AlertRule.id)
+        if user_id is not None:
+            stmt = stmt.where(AlertRule.user_id == user_id)
+        else:
+            stmt = stmt.join(User, User.user_tg_id == AlertRule.user_id).where(
+                User.is_banned == False
+            )
+        async with self.sessionmaker() as session:
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
+    async def delete_alert_rule(self, user_id: int, rule_id: int) -> bool:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                delete(AlertRule)
+                .where(AlertRule.id == rule_id, AlertRule.user_id == user_id)
+                .returning(AlertRule.id)
+            )
+            await session.commit()
+            return result.first() is not None
+
+    # ==================== COMMUNITY TIMELINE OPERATIONS ====================
+
+    async def get_crawl_checkpoint(
+        self, community_id: str
+    ) -> Optional[CommunityCrawlCheckpoint]:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(CommunityCrawlCheckpoint).where(
+                    CommunityCrawlCheckpoint.community_id == community_id
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def save_crawl_checkpoint(
+        self,
+        community_id: str,
+        cursor: Optional[str],
+        next_position: int,
+        is_complete: bool,
+    ) -> None:
+        values = {
+            "cursor": cursor,
+            "next_position": next_position,
+            "is_complete": is_complete,
+        }
         async with self.sessionmaker() as session:
             await session.execute(
-                insert(Tweet).values(
-                    tweet_url=tweet_url,
-                    tweet_id=tweet_id,
-                    user_id=user_id,
-                    community_id=community_id,
+                insert(CommunityCrawlCheckpoint)
+                .values(community_id=community_id, **values)
+                .on_conflict_do_update(
+                    index_elements=[CommunityCrawlCheckpoint.community_id],
+                    set_={**values, "updated_at": func.now()},
                 )
             )
             await session.commit()
-            return True
+
+    async def start_crawl_pass(self, community_id: str) -> datetime:
+        """Reset the checkpoint to the top, returns when the pass started."""
+        values = {
+            "cursor": None,
+            "next_position": 1,
+            "is_complete": False,
+            "pass_started_at": func.now(),
+        }
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                insert(CommunityCrawlCheckpoint)
+                .values(community_id=community_id, **values)
+                .on_conflict_do_update(
+                    index_elements=[CommunityCrawlCheckpoint.community_id],
+                    set_={**values, "updated_at": func.now()},
+                )
+                .returning(CommunityCrawlCheckpoint.pass_started_at)
+            )
+            await session.commit()
+            return result.scalar_one()
+
+    async def get_crawl_pass_tweet_ids(
+        self, community_id: str, pass_started_at: datetime
+    ) -> Set[str]:
+        """Tweets already saved by the pass that started at pass_started_at."""
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(CommunityTimelineEntry.tweet_id).where(
+                    CommunityTimelineEntry.community_id == community_id,
+                    CommunityTimelineEntry.last_seen_at >= pass_started_at,
+                )
+            )
+            return set(result.scalars().all())
+
+    async def prune_timeline_entries(
+        self,
+        community_id: str,
+        pass_started_at: datetime,
+        below_position: Optional[int] = None,
+    ) -> int:
+        """
+        Delete entries not seen by the pass that started at pass_started_at,
+        only those ranked above below_position when it is given. Returns how
+        many were deleted.
+        """
+        query = delete(CommunityTimelineEntry).where(
+            CommunityTimelineEntry.community_id == community_id,
+            CommunityTimelineEntry.last_seen_at < pass_started_at,
+        )
+        if below_position is not None:
+            query = query.where(CommunityTimelineEntry.position < below_position)
+        async with self.sessionmaker() as session:
+            result = await session.execute(query)
+            await session.commit()
+            return result.rowcount
+
+    async def save_timeline_entries(
+        self, community_id: str, entries: Sequence[Tuple[str, int]]
+    ) -> int:
+        """
+        Upsert (tweet_id, position) pairs of one crawled page. Returns how
+        many of them are new or moved since they were last seen.
+        """
+        if not entries:
+            return 0
+        positions = dict(entries)
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(
+                    CommunityTimelineEntry.tweet_id, CommunityTimelineEntry.position
+                ).where(
+                    CommunityTimelineEntry.community_id == community_id,
+                    CommunityTimelineEntry.tweet_id.in_(positions),
+                )
+            )
+            known = dict(result.all())
+            changed = sum(
+                1
+                for tweet_id, position in positions.items()
+                if known.get(tweet_id) != position
+            )
+
+            stmt = insert(CommunityTimelineEntry).values(
+                [
+                    {
+                        "community_id": community_id,
+                        "tweet_id": tweet_id,
+                        "position": position,
+                    }
+                    for tweet_id, position in positions.items()
+                ]
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    constraint="uq_community_timeline_entries_community_tweet",
+                    set_={
+                        "position": stmt.excluded.position,
+                        "last_seen_at": func.now(),
+                    },
+                )
+            )
+            await session.commit()
+        return changed
+
+    # ==================== CHECK JOB OPERATIONS ====================
+
+    async def create_check_job(self, tweet_ids: Sequence[str]) -> int:
+        async with self.sessionmaker() as session:
+            async with session.begin():
+                job = CheckJob(tweet_ids=list(tweet_ids))
+                session.add(job)
+                await session.flush()
+                # Delivered to the checker when the transaction commits
+                await session.execute(
+                    select(func.pg_notify(CHECK_JOBS_CHANNEL, str(job.id)))
+                )
+            return job.id
+
+    async def get_check_job(self, job_id: int) -> Optional[CheckJob]:
+        async with self.sessionmaker() as session:
+            return await session.get(CheckJob, job_id)
+
+    async def claim_check_jobs(self, limit: int) -> List[CheckJob]:
+        """
+        Mark up to limit pending jobs as running and return them, oldest
+        first. Jobs locked by another checker process are skipped.
+        """
+        pending = (
+            select(CheckJob.id)
+            .where(CheckJob.status == CheckJobStatus.PENDING)
+            .order_by(CheckJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                update(CheckJob)
+                .where(CheckJob.id.in_(pending.scalar_subquery()))
+                .values(status=CheckJobStatus.RUNNING)
+                .returning(CheckJob)
+            )
+            jobs = sorted(result.scalars().all(), key=lambda job: job.id)
+            await session.commit()
+            return jobs
+
+    async def finish_check_job(self, job_id: int, result: Optional[dict]) -> None:
+        """Store the result of a job; a None result marks it as failed."""
+        async with self.sessionmaker() as session:
+            await session.execute(
+                update(CheckJob)
+                .where(CheckJob.id == job_id)
+                .values(
+                    status=(
+                        CheckJobStatus.FAILED if result is None else CheckJobStatus.DONE
+                    ),
+                    result=result,
+                    finished_at=func.now(),
+                )
+            )
+            await session.commit()
+
+    async def release_check_jobs(self, job_ids: Sequence[int]) -> None:
+        """Put running jobs back in the queue, e.g. when a checker shuts down."""
+        async with self.sessionmaker() as session:
+            await session.execute(
+                update(CheckJob)
+                .where(
+                    CheckJob.id.in_(job_ids),
+                    CheckJob.status == CheckJobStatus.RUNNING,
+                )
+                .values(status=CheckJobStatus.PENDING)
+            )
+            await session.commit()
+
+    async def purge_check_jobs(self, max_age: timedelta) -> int:
+        """
+        Delete jobs older than max_age. Nobody waits for them any more,
+        including jobs left running by a checker that died.
+        """
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                delete(CheckJob)
+                .where(CheckJob.created_at < func.now() - max_age)
+                .returning(CheckJob.id)
+            )
+            await session.commit()
+            return len(result.all())
+
+
+def _batches(items: Sequence, size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
@@ -0,0 +1,97 @@
+"""
+Schema migrations CLI.
+
+    python -m core.db.migrate upgrade [revision]
+    python -m core.db.migrate downgrade <revision>
+    python -m core.db.migrate current
+    python -m core.db.migrate history
+    python -m core.db.migrate stamp <revision>
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI = os.path.join(ROOT_DIR, "alembic.ini")
+SCRIPT_LOCATION = os.path.join(ROOT_DIR, "core", "db", "migrations")
+
+
+def get_alembic_config(connection: Connection | None = None) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", SCRIPT_LOCATION)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def _upgrade(connection: Connection, revision: str) -> None:
+    command.upgrade(get_alembic_config(connection), revision)
+
+
+def _is_current(connection: Connection, revision: str) -> bool:
+    script = ScriptDirectory.from_config(get_alembic_config())
+    target = set(script.get_heads()) if revision == "head" else {revision}
+    current = MigrationContext.configure(connection).get_current_heads()
+    return set(current) == target
+
+
+async def upgrade_database(engine: AsyncEngine, revision: str = "head") -> bool:
+    """
+    Apply migrations up to revision over a connection of the given engine.
+    A database already at revision is left alone without loading env.py
+    and the models; returns whether migrations ran.
+    """
+    async with engine.connect() as conn:
+        if await conn.run_sync(_is_current, revision):
+            return False
+        # Migrations manage their own transactions, e.g. autocommit blocks
+        await conn.rollback()
+        await conn.run_sync(_upgrade, revision)
+        await conn.commit()
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m core.db.migrate")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    upgrade_parser = subparsers.add_parser("upgrade", help="Upgrade to a revision")
+    upgrade_parser.add_argument("revision", nargs="?", default="head")
+
+    downgrade_parser = subparsers.add_parser("downgrade", help="Revert to a revision")
+    downgrade_parser.add_argument("revision")
+
+    stamp_parser = subparsers.add_parser(
+        "stamp", help="Mark a revision as applied without running it"
+    )
+    stamp_parser.add_argument("revision")
+
+    subparsers.add_parser("current", help="Show the applied revision")
+    subparsers.add_parser("history", help="List revisions")
+
+    args = parser.parse_args()
+    config = get_alembic_config()
+
+    if args.action == "upgrade":
+        command.upgrade(config, args.revision)
+    elif args.action == "downgrade":
+        command.downgrade(config, args.revision)
+    elif args.action == "stamp":
+        command.stamp(config, args.revision)
+    elif args.action == "current":
+        command.current(config, verbose=True)
+    elif args.action == "history":
+        command.history(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 12:00:00
+
+Databases created by Base.metadata.create_all before migrations existed
+already have these tables, so each one is created only if it is missing.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "app_config" not in existing:
+        op.create_table(
+            "app_config",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("unique_name", sa.String(255), nullable=False),
+            sa.Column("value", sa.Text(), nullable=True),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("description_en", sa.Text(), nullable=True),
+            sa.Column("type_", sa.String(16), nullable=False),
+            sa.Column("sub_data", sa.String(64), nullable=True),
+        )
+        op.create_index(
+            "ix_app_config_unique_name", "app_config", ["unique_name"], unique=True
+        )
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_tg_id", sa.BigInteger(), nullable=False),
+            sa.Column("username", sa.String(255), nullable=True),
+            sa.Column("first_name", sa.String(255), nullable=True),
+            sa.Column("last_name", sa.String(255), nullable=True),
+            sa.Column("language", sa.String(10), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.Column(
+                "updated_at",
+                sa.DateTime(),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.Column("is_admin", sa.Boolean(), nullable=False),
+            sa.Column("is_banned", sa.Boolean(), nullable=False),
+        )
+        op.create_index("ix_users_user_tg_id", "users", ["user_tg_id"], unique=True)
+
+    if "tweets" not in existing:
+        op.create_table(
+            "tweets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column(
+                "user_id",
+                sa.BigInteger(),
+                sa.ForeignKey("users.user_tg_id"),
+                nullable=False,
+            ),
+            sa.Column("tweet_url", sa.String(255), nullable=False),
+            sa.Column("tweet_id", sa.String(255), nullable=False),
+            sa.Column("community_id", sa.String(255), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("on_top", sa.Boolean(), nullable=False),
+        )
+        op.create_index("ix_tweets_tweet_url", "tweets", ["tweet_url"])
+        op.create_index("ix_tweets_tweet_id", "tweets", ["tweet_id"])
+        op.create_index("ix_tweets_community_id", "tweets", ["community_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("tweets")
+    op.drop_table("users")
+    op.drop_table("app_config")
@@ -0,0 +1,113 @@
+"""Store tweets once and track users through subscriptions
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:00:00
+
+Legacy rows sharing (tweet_id, community_id) are merged into the lowest id
+and every former owner becomes a subscriber of the merged row.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MERGE_DUPLICATE_TWEETS = (
+    """
+    CREATE TEMP TABLE tweet_keepers ON COMMIT DROP AS
+    SELECT id, min(id) OVER (PARTITION BY tweet_id, community_id) AS keeper_id
+    FROM tweets
+    """,
+    """
+    INSERT INTO subscriptions (user_id, tweet_pk, is_active)
+    SELECT t.user_id, k.keeper_id, bool_or(t.is_active)
+    FROM tweets t JOIN tweet_keepers k ON k.id = t.id
+    GROUP BY t.user_id, k.keeper_id
+    ON CONFLICT ON CONSTRAINT uq_subscriptions_user_tweet DO NOTHING
+    """,
+    """
+    UPDATE tweets t
+    SET is_active = merged.is_active, on_top = merged.on_top
+    FROM (
+        SELECT k.keeper_id, bool_or(d.is_active) AS is_active,
+               bool_or(d.on_top) AS on_top
+        FROM tweets d JOIN tweet_keepers k ON k.id = d.id
+        GROUP BY k.keeper_id
+    ) merged
+    WHERE t.id = merged.keeper_id
+    """,
+    """
+    DELETE FROM tweets t USING tweet_keepers k
+    WHERE k.id = t.id AND k.id <> k.keeper_id
+    """,
+    "ALTER TABLE tweets DROP COLUMN user_id",
+    """
+    ALTER TABLE tweets ADD CONSTRAINT uq_tweets_tweet_id_community_id
+    UNIQUE NULLS NOT DISTINCT (tweet_id, community_id)
+    """,
+)
+
+SPLIT_SUBSCRIPTIONS = (
+    "ALTER TABLE tweets DROP CONSTRAINT uq_tweets_tweet_id_community_id",
+    "ALTER TABLE tweets ADD COLUMN user_id BIGINT REFERENCES users (user_tg_id)",
+    """
+    INSERT INTO tweets (user_id, tweet_url, tweet_id, community_id, is_active, on_top)
+    SELECT s.user_id, t.tweet_url, t.tweet_id, t.community_id,
+           t.is_active AND s.is_active, t.on_top
+    FROM subscriptions s JOIN tweets t ON t.id = s.tweet_pk
+    """,
+    "DELETE FROM tweets WHERE user_id IS NULL",
+    "ALTER TABLE tweets ALTER COLUMN user_id SET NOT NULL",
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if "subscriptions" not in inspector.get_table_names():
+        op.create_table(
+            "subscriptions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column(
+                "user_id",
+                sa.BigInteger(),
+                sa.ForeignKey("users.user_tg_id"),
+                nullable=False,
+            ),
+            sa.Column(
+                "tweet_pk",
+                sa.Integer(),
+                sa.ForeignKey("tweets.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.UniqueConstraint(
+                "user_id", "tweet_pk", name="uq_subscriptions_user_tweet"
+            ),
+        )
+        op.create_index("ix_subscriptions_user_id", "subscriptions", ["user_id"])
+        op.create_index("ix_subscriptions_tweet_pk", "subscriptions", ["tweet_pk"])
+
+    # Databases initialised after the model change have no legacy column
+    columns = {column["name"] for column in inspector.get_columns("tweets")}
+    if "user_id" in columns:
+        for statement in MERGE_DUPLICATE_TWEETS:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in SPLIT_SUBSCRIPTIONS:
+        op.execute(statement)
+    op.drop_table("subscriptions")
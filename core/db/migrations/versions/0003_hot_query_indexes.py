@@ -0,0 +1,78 @@
+"""Indexes for the checker's hot queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 12:00:00
+
+get_all_active_tweets filters tweets by is_active and probes subscriptions
+for an active row per tweet, so both get partial indexes over the active
+rows only. set_on_top_status and set_as_inactive are served by the
+(tweet_id, community_id) unique constraint, which makes the single-column
+tweet indexes redundant. Everything runs CONCURRENTLY outside of the
+migration transaction so the tables stay writable.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REDUNDANT_INDEXES = (
+    ("ix_tweets_tweet_url", "tweets", ["tweet_url"]),
+    ("ix_tweets_tweet_id", "tweets", ["tweet_id"]),
+    ("ix_tweets_community_id", "tweets", ["community_id"]),
+    ("ix_subscriptions_user_id", "subscriptions", ["user_id"]),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tweets_active",
+            "tweets",
+            ["id"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_subscriptions_active_tweet_pk",
+            "subscriptions",
+            ["tweet_pk"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for name, table, _ in REDUNDANT_INDEXES:
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.drop_index(
+            "ix_subscriptions_active_tweet_pk",
+            table_name="subscriptions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_tweets_active",
+            table_name="tweets",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,43 @@
+"""Queue of on-demand checks between the bot and checker processes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "check_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("tweet_ids", postgresql.ARRAY(sa.String(255)), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("result", postgresql.JSONB(), nullable=True),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_check_jobs_pending",
+        "check_jobs",
+        ["id"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_check_jobs_pending", table_name="check_jobs")
+    op.drop_table("check_jobs")
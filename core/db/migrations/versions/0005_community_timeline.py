@@ -0,0 +1,65 @@
+"""Community timeline entries and crawl checkpoints
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "community_timeline_entries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("community_id", sa.String(255), nullable=False),
+        sa.Column("tweet_id", sa.String(255), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column(
+            "first_seen_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column(
+            "last_seen_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "community_id",
+            "tweet_id",
+            name="uq_community_timeline_entries_community_tweet",
+        ),
+    )
+    op.create_index(
+        "ix_community_timeline_entries_ranking",
+        "community_timeline_entries",
+        ["community_id", "position"],
+    )
+    op.create_table(
+        "community_crawl_checkpoints",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("community_id", sa.String(255), nullable=False),
+        sa.Column("cursor", sa.Text(), nullable=True),
+        sa.Column("next_position", sa.Integer(), nullable=False),
+        sa.Column("is_complete", sa.Boolean(), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("community_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("community_crawl_checkpoints")
+    op.drop_index(
+        "ix_community_timeline_entries_ranking",
+        table_name="community_timeline_entries",
+    )
+    op.drop_table("community_timeline_entries")
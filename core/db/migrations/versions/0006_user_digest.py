@@ -0,0 +1,28 @@
+"""Per-user notification digest settings
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users", sa.Column("digest_interval_minutes", sa.Integer(), nullable=True)
+    )
+    op.add_column("users", sa.Column("digest_sent_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "digest_sent_at")
+    op.drop_column("users", "digest_interval_minutes")
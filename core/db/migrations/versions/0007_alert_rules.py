@@ -0,0 +1,38 @@
+"""Growth alert rules
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "alert_rules",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("metric", sa.String(32), nullable=False),
+        sa.Column("threshold", sa.BigInteger(), nullable=False),
+        sa.Column("window_minutes", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.user_tg_id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_alert_rules_user_id", "alert_rules", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_alert_rules_user_id", table_name="alert_rules")
+    op.drop_table("alert_rules")
@@ -0,0 +1,51 @@
+"""Tweet stats history
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTS = (
+    "views_count",
+    "favorite_count",
+    "retweet_count",
+    "reply_count",
+    "bookmark_count",
+    "quote_count",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tweet_stats_history",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "observed_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column("tweet_id", sa.String(255), nullable=False),
+        sa.Column("community_id", sa.String(255), nullable=True),
+        *(sa.Column(name, sa.BigInteger(), nullable=False) for name in COUNTS),
+        sa.Column("on_top", sa.Boolean(), nullable=True),
+        sa.Column("rank", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_tweet_stats_history_observed_at", "tweet_stats_history", ["observed_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_tweet_stats_history_observed_at", table_name="tweet_stats_history"
+    )
+    op.drop_table("tweet_stats_history")
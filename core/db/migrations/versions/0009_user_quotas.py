@@ -0,0 +1,33 @@
+"""Per-user tweet quota, check interval and fetch weight
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("max_tweets", sa.Integer(), nullable=True))
+    op.add_column(
+        "users", sa.Column("check_interval_seconds", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "users",
+        sa.Column("fetch_weight", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "fetch_weight")
+    op.drop_column("users", "check_interval_seconds")
+    op.drop_column("users", "max_tweets")
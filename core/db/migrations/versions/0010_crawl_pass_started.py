@@ -0,0 +1,27 @@
+"""Start time of the current community crawl pass
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "community_crawl_checkpoints",
+        sa.Column("pass_started_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("community_crawl_checkpoints", "pass_started_at")
@@ -10,7 +10,11 @@ from sqlalchemy import (
     Text,
     func,
     ForeignKey,
+    Index,
+    UniqueConstraint,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -25,6 +29,13 @@ class TypeEnum(str, Enum):
     TIME = "time"
 
 
+class CheckJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class AppConfig(Base):
     __tablename__ = "app_config"
 
@@ -78,19 +89,194 @@ class User(Base):
     )
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_banned: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Users with an interval get their notifications as a periodic digest
+    digest_interval_minutes: Mapped[int | None] = mapped_column(nullable=True)
+    digest_sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Quotas, None falls back to user_max_tweets and to every sweep
+    max_tweets: Mapped[int | None] = mapped_column(nullable=True)
+    check_interval_seconds: Mapped[int | None] = mapped_column(nullable=True)
+    # Share of the fetch queue relative to other users
+    fetch_weight: Mapped[int] = mapped_column(
+        default=1, server_default="1", nullable=False
+    )
 
-    tweets: Mapped[List["Tweet"]] = relationship(back_populates="user")
+    subscriptions: Mapped[List["Subscription"]] = relationship(back_populates="user")
 
 
 class Tweet(Base):
+    """
+    A tracked tweet, stored once per (tweet_id, community_id).
+
+    is_active is cleared when the tweet is deleted on X; users stop
+    tracking a tweet by deactivating their Subscription.
+    """
+
     __tablename__ = "tweets"
+    __table_args__ = (
+        UniqueConstraint(
+            "tweet_id",
+            "community_id",
+            name="uq_tweets_tweet_id_community_id",
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index("ix_tweets_active", "id", postgresql_where=text("is_active")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_tg_id"), nullable=False)
-    tweet_url: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
-    tweet_id: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
-    community_id: Mapped[str] = mapped_column(String(255), nullable=True, index=True)
+    tweet_url: Mapped[str] = mapped_column(String(255), nullable=False)
+    tweet_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    community_id: Mapped[str] = mapped_column(String(255), nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     on_top: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
-    user = relationship("User", back_populates="tweets")
+    subscriptions: Mapped[List["Subscription"]] = relationship(back_populates="tweet")
+
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "tweet_pk", name="uq_subscriptions_user_tweet"),
+        Index(
+            "ix_subscriptions_active_tweet_pk",
+            "tweet_pk",
+            postgresql_where=text("is_active"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_tg_id"), nullable=False)
+    tweet_pk: Mapped[int] = mapped_column(
+        ForeignKey("tweets.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+    user = relationship("User", back_populates="subscriptions")
+    tweet = relationship("Tweet", back_populates="subscriptions")
+
+
+class CheckJob(Base):
+    """
+    An on-demand check requested by the bot and run by the checker process.
+
+    result holds the FetchResult of a finished job as JSON.
+    """
+
+    __tablename__ = "check_jobs"
+    __table_args__ = (
+        Index(
+            "ix_check_jobs_pending",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tweet_ids: Mapped[List[str]] = mapped_column(ARRAY(String(255)), nullable=False)
+    status: Mapped[CheckJobStatus] = mapped_column(
+        String(16), nullable=False, default=CheckJobStatus.PENDING
+    )
+    result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class CommunityTimelineEntry(Base):
+    """
+    Position of a tweet in the ranked timeline of a community, as of the
+    last crawl that reached it.
+    """
+
+    __tablename__ = "community_timeline_entries"
+    __table_args__ = (
+        UniqueConstraint(
+            "community_id",
+            "tweet_id",
+            name="uq_community_timeline_entries_community_tweet",
+        ),
+        Index("ix_community_timeline_entries_ranking", "community_id", "position"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    community_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    tweet_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    position: Mapped[int] = mapped_column(nullable=False)
+    first_seen_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+    last_seen_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+
+class CommunityCrawlCheckpoint(Base):
+    """
+    Where the crawl of a community stopped. An incomplete crawl resumes
+    from cursor with positions counted on from next_position; entries saved
+    since pass_started_at belong to the pass in progress.
+    """
+
+    __tablename__ = "community_crawl_checkpoints"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    community_id: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    cursor: Mapped[str | None] = mapped_column(Text, nullable=True)
+    next_position: Mapped[int] = mapped_column(nullable=False, default=1)
+    is_complete: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    pass_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class AlertRule(Base):
+    """
+    A user's threshold on a tweet metric, checked for every tweet the user
+    tracks. Without window_minutes it fires when the metric reaches
+    threshold, with it when the metric grew by threshold within the window.
+    """
+
+    __tablename__ = "alert_rules"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.user_tg_id"), nullable=False, index=True
+    )
+    metric: Mapped[str] = mapped_column(String(32), nullable=False)
+    threshold: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    window_minutes: Mapped[int | None] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+
+class TweetStatsSample(Base):
+    """
+    Stats of a tracked tweet as seen by one sweep, for offline analysis.
+    Written every stats_history_interval_seconds and read back in bulk by
+    core.services.history_export.
+    """
+
+    __tablename__ = "tweet_stats_history"
+    __table_args__ = (Index("ix_tweet_stats_history_observed_at", "observed_at"),)
+
+    # Minute-level history outgrows a 32-bit key
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    observed_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+    tweet_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    community_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    views_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    favorite_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    retweet_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    reply_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    bookmark_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    quote_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Only set for tweets tracked in a community
+    on_top: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    rank: Mapped[int | None] = mapped_column(nullable=True)
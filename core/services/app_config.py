@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.db.database_handler import CONFIG_CHANNEL, DatabaseHandler
+from core.db.tables import AppConfig
+
+# Runtime settings with their defaults, used until a row overrides them
+DEFAULTS: Dict[str, Any] = {
+    "check_interval_seconds": 60,
+    "fetch_concurrency": 10,
+    "top_size": 2,
+    "telegram_messages_per_second": 25.0,
+    # Notifications are grouped per user over this window, 0 = per tick
+    "notify_coalesce_seconds": 0,
+    # Community timeline crawler, disabled while the interval is 0
+    "crawl_interval_seconds": 0,
+    "crawl_max_pages": 10,
+    "crawl_page_size": 20,
+    # Ticks at least this long are profiled to PROFILE_DIR, 0 disables it
+    "tick_profile_threshold_seconds": 0,
+    # Stats are written to tweet_stats_history at most this often, 0 = never
+    "stats_history_interval_seconds": 0,
+    # Half-life of the smoothed growth velocity shown in alerts
+    "growth_half_life_seconds": 600,
+    # Tracked tweets per user unless users.max_tweets is set, 0 = unlimited
+    "user_max_tweets": 0,
+    # The checker's in-memory tweet index is compared with the DB this often
+    "tweet_index_reconcile_seconds": 300,
+    # Tweet stats and community tops are shared through the cache for this
+    # long, keep it below check_interval_seconds; 0 = always fetch
+    "fetch_cache_seconds": 0,
+    # Community tops are polled between these intervals depending on how
+    # often they change, see CommunityChurn
+    "community_poll_min_seconds": 30,
+    "community_poll_max_seconds": 600,
+    # X requests per sweep; 0 derives the budget from the measured request
+    # rate and tick_budget_fraction of check_interval_seconds
+    "tick_request_budget": 0,
+    # 0 disables load shedding unless tick_request_budget is set
+    "tick_budget_fraction": 0.8,
+    # Tweets younger than this are never shed, see RequestBudget
+    "shed_protect_hours": 24,
+}
+
+# Smallest valid value of a setting; other numeric settings only have to be
+# non-negative. Anything outside falls back to the default
+MINIMUMS: Dict[str, float] = {
+    "check_interval_seconds": 1,
+    "fetch_concurrency": 1,
+    "top_size": 1,
+    "telegram_messages_per_second": 0.1,
+    "crawl_max_pages": 1,
+    "crawl_page_size": 1,
+    "growth_half_life_seconds": 1,
+    "tweet_index_reconcile_seconds": 1,
+    "community_poll_min_seconds": 1,
+    "community_poll_max_seconds": 1,
+}
+
+
+def validate(unique_name: str, value: Any) -> Any:
+    """Coerce a value to the type of its default, ValueError when invalid."""
+    if unique_name not in DEFAULTS:
+        return value
+    expected = type(DEFAULTS[unique_name])
+    try:
+        coerced = expected(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{value!r} is not {expected.__name__}") from None
+    if isinstance(value, bool) or (coerced != value and not isinstance(value, str)):
+        raise ValueError(f"{value!r} is not {expected.__name__}")
+    minimum = MINIMUMS.get(unique_name, 0)
+    # Written so that NaN is rejected too
+    if not coerced >= minimum:
+        raise ValueError(f"{value!r} is below {minimum}")
+    return coerced
+
+
+class ConfigService:
+    """
+    In-memory view of the app_config table with values decoded once.
+
+    Lookups never touch the database. The snapshot is reloaded when
+    set_config sends a NOTIFY on CONFIG_CHANNEL, and every refresh_interval
+    seconds as a fallback for missed notifications.
+    """
+
+    def __init__(self, refresh_interval: float = 300):
+        self.refresh_interval = refresh_interval
+        self._values: Dict[str, Any] = dict(DEFAULTS)
+        self._db: Optional[DatabaseHandler] = None
+        self._listen_conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reloads: Set[asyncio.Task] = set()
+
+    def get(self, unique_name: str, default: Any = None) -> Any:
+        value = self._values.get(unique_name)
+        return default if value is None else value
+
+    def __getitem__(self, unique_name: str) -> Any:
+        return self._values[unique_name]
+
+    async def load(self, db: DatabaseHandler) -> None:
+        self._db = db
+        async with db.sessionmaker() as session:
+            result = await session.execute(select(AppConfig))
+            rows = result.scalars().all()
+
+        values = dict(DEFAULTS)
+        for row in rows:
+            try:
+                value = row.get_value()
+                if value is not None:
+                    values[row.unique_name] = validate(row.unique_name, value)
+            except ValueError as e:
+                logger.warning(
+                    f"Bad value for config {row.unique_name}, using the default: {e}"
+                )
+        # Readers in other threads only ever see a complete snapshot
+        self._values = values
+
+    async def start(self, db: DatabaseHandler) -> None:
+        await self.load(db)
+        await self._listen()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self._unlisten()
+
+    async def _listen(self) -> None:
+        try:
+            self._listen_conn = await self._db.engine.connect()
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.add_listener(CONFIG_CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning(f"LISTEN {CONFIG_CHANNEL} failed, polling only: {e}")
+            await self._unlisten()
+
+    async def _ensure_listening(self) -> None:
+        if self._listen_conn is not None:
+            raw = await self._listen_conn.get_raw_connection()
+            if not raw.driver_connection.is_closed():
+                return
+            await self._unlisten()
+        await self._listen()
+
+    async def _unlisten(self) -> None:
+        if self._listen_conn is None:
+            return
+        try:
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.remove_listener(CONFIG_CHANNEL, self._on_notify)
+            await self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        logger.info(f"Config {payload} changed, reloading")
+        task = asyncio.create_task(self.load(self._db))
+        self._reloads.add(task)
+        task.add_done_callback(self._on_reload_done)
+
+    def _on_reload_done(self, task: asyncio.Task) -> None:
+        self._reloads.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Config reload failed: {task.exception()}")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load(self._db)
+                await self._ensure_listening()
+            except Exception as e:
+                logger.warning(f"Config refresh failed: {e}")
+
+
+app_config = ConfigService()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from core.db.tables import Tweet
+from core.services.app_config import app_config
+from core.utils.tweet_links import tweet_created_at
+
+# Weight of the newest sweep in the measured request rate
+RATE_SMOOTHING = 0.3
+
+
+@dataclass
+class TickPlan:
+    # Tweets checked by this sweep and tweets postponed to a later one
+    tweets: List[Tweet] = field(default_factory=list)
+    shed: List[Tweet] = field(default_factory=list)
+    # Estimated X requests of the sweep
+    stats_requests: int = 0
+    community_requests: int = 0
+    budget: Optional[int] = None
+
+
+class RequestBudget:
+    """
+    Caps the X requests of a sweep so it finishes within its interval.
+
+    The budget is tick_request_budget if set, otherwise what the measured
+    request rate gets through in tick_budget_fraction of
+    check_interval_seconds. A sweep that would exceed it sheds work in
+    tiers: community tops are always fetched, since they decide the top
+    status of every tracked tweet, and so are the stats of tweets that are
+    on top or younger than shed_protect_hours, so their deletion and top
+    alerts are never late. Older tweets share what is left, least recently
+    checked first, and take turns across sweeps. While sweeps shed, the
+    crawler only refreshes the first page of each timeline and the pass in
+    progress waits in its checkpoint.
+    """
+
+    def __init__(self):
+        # tweet_id -> monotonic time its stats were last fetched by a sweep
+        self._checked_at: Dict[str, float] = {}
+        # Requests per second of the recent sweeps
+        self.rate: Optional[float] = None
+        self.shedding = False
+
+        # Exposed on /metrics
+        self.shed_stats_total = 0
+        self.shed_pages_total = 0
+        self.last_plan = TickPlan()
+
+    def limit(self) -> Optional[int]:
+        """Requests a sweep may make, None while unlimited or unmeasured."""
+        fixed = app_config["tick_request_budget"]
+        if fixed > 0:
+            return fixed
+        fraction = app_config["tick_budget_fraction"]
+        if fraction <= 0 or self.rate is None:
+            return None
+        return int(self.rate * app_config["check_interval_seconds"] * fraction)
+
+    def plan(
+        self,
+        tweets: List[Tweet],
+        community_requests: int,
+        now: Optional[float] = None,
+    ) -> TickPlan:
+        """Choose the tweets a sweep checks within the budget."""
+        now = time.monotonic() if now is None else now
+        tweet_ids = list(dict.fromkeys(tweet.tweet_id for tweet in tweets))
+        plan = TickPlan(
+            tweets=tweets,
+            stats_requests=len(tweet_ids),
+            community_requests=community_requests,
+            budget=self.limit(),
+        )
+        if plan.budget is None or len(tweet_ids) + community_requests <= plan.budget:
+            self.shedding = False
+            self.last_plan = plan
+            return plan
+
+        protect_after = time.time() - app_config["shed_protect_hours"] * 3600
+        protected = {tweet.tweet_id for tweet in tweets if tweet.on_top}
+        protected.update(
+            tweet_id
+            for tweet_id in tweet_ids
+            if (tweet_created_at(tweet_id) or math.inf) >= protect_after
+        )
+        rest = sorted(
+            (tweet_id for tweet_id in tweet_ids if tweet_id not in protected),
+            key=lambda tweet_id: self._checked_at.get(tweet_id, -math.inf),
+        )
+        room = max(0, plan.budget - community_requests - len(protected))
+        keep = protected.union(rest[:room])
+
+        plan.tweets = [tweet for tweet in tweets if tweet.tweet_id in keep]
+        plan.shed = [tweet for tweet in tweets if tweet.tweet_id not in keep]
+        self.shed_stats_total += len(tweet_ids) - len(keep)
+        self.shedding = True
+        self.last_plan = plan
+        return plan
+
+    def record(
+        self, tweets: Iterable[Tweet], requests: int, seconds: float, now: float
+    ) -> None:
+        """Note the tweets a sweep checked and how fast its requests went."""
+        self._checked_at.update((tweet.tweet_id, now) for tweet in tweets)
+        if requests <= 0 or seconds <= 0:
+            return
+        rate = requests / seconds
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate += RATE_SMOOTHING * (rate - self.rate)
+
+    def shed_crawl_page(self) -> None:
+        """Count a timeline page the crawler left unfetched while shedding."""
+        self.shed_pages_total += 1
+
+    def retain(self, tweet_ids: Iterable[str]) -> None:
+        keep = set(tweet_ids)
+        self._checked_at = {
+            tweet_id: at
+            for tweet_id, at in self._checked_at.items()
+            if tweet_id in keep
+        }
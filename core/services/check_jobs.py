@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from config import SHUTDOWN_TIMEOUT
+from core.db.database_handler import CHECK_JOBS_CHANNEL, DatabaseHandler
+from core.db.tables import CheckJob, CheckJobStatus, Tweet
+from core.services.fetch_engine import FetchResult
+from core.utils.logs import EventLogger
+
+if TYPE_CHECKING:
+    from core.services.checker import Checker
+
+# Jobs claimed by one worker at a time
+CHECK_JOBS_BATCH = 20
+# Finished and abandoned jobs are deleted after this age
+CHECK_JOBS_MAX_AGE = timedelta(hours=1)
+# Sampled by the "check_job_poll_failed" rate of core.utils.logs
+poll_failed_log = EventLogger("check_job_poll_failed")
+
+
+class CheckJobWorker:
+    """
+    Runs on-demand checks queued in the check_jobs table by bot processes.
+
+    New jobs are picked up as soon as their NOTIFY on CHECK_JOBS_CHANNEL
+    arrives and every poll_interval seconds as a fallback. Several checker
+    processes may share the queue, claims skip locked rows. On shutdown
+    running jobs get a timeout to finish and the rest go back to the queue
+    for the next checker.
+    """
+
+    def __init__(self, db: DatabaseHandler, checker: Checker, poll_interval: float = 5):
+        self.db = db
+        self.checker = checker
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._listen_conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        # Running job task -> job id
+        self._running: Dict[asyncio.Task, int] = {}
+
+    async def start(self) -> None:
+        await self._listen()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self._unlisten()
+        if not self._running:
+            return
+        running = dict(self._running)
+        _, unfinished = await asyncio.wait(list(running), timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await self.db.release_check_jobs([running[task] for task in unfinished])
+            logger.warning(f"Returned {len(unfinished)} check jobs to the queue")
+
+    async def _listen(self) -> None:
+        try:
+            self._listen_conn = await self.db.engine.connect()
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.add_listener(
+                CHECK_JOBS_CHANNEL, self._on_notify
+            )
+        except Exception as e:
+            logger.warning(f"LISTEN {CHECK_JOBS_CHANNEL} failed, polling only: {e}")
+            await self._unlisten()
+
+    async def _unlisten(self) -> None:
+        if self._listen_conn is None:
+            return
+        try:
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.remove_listener(
+                CHECK_JOBS_CHANNEL, self._on_notify
+            )
+            await self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        last_purge = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                for job in await self.db.claim_check_jobs(CHECK_JOBS_BATCH):
+                    task = asyncio.create_task(self._run_job(job))
+                    self._running[task] = job.id
+                    task.add_done_callback(self._forget)
+                if time.monotonic() - last_purge > CHECK_JOBS_MAX_AGE.total_seconds():
+                    await self.db.purge_check_jobs(CHECK_JOBS_MAX_AGE)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                poll_failed_log.warning("Check job polling failed: {error}", error=e)
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self._running.pop(task, None)
+
+    async def _run_job(self, job: CheckJob) -> None:
+        result = None
+        try:
+            _, fetched = await self.checker.check_now(job.tweet_ids)
+            result = asdict(fetched)
+        except Exception as e:
+            logger.error(f"Check job {job.id} failed: {e}")
+        await self.db.finish_check_job(job.id, result)
+
+
+class RemoteChecker:
+    """
+    Bot-side stand-in for Checker that queues on-demand checks for the
+    checker process instead of fetching from X itself.
+
+    enqueue returns a task with the same (tweets, FetchResult) result as
+    Checker.enqueue, resolved by polling the job row.
+    """
+
+    def __init__(
+        self, db: DatabaseHandler, poll_interval: float = 0.5, timeout: float = 120
+    ):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._waiting: Set[asyncio.Task] = set()
+
+    def enqueue(self, tweet_ids: Sequence[str]) -> asyncio.Task:
+        task = asyncio.create_task(self._check(list(tweet_ids)))
+        self._waiting.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._waiting.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"On-demand check failed: {task.exception()}")
+
+    async def _check(self, tweet_ids: List[str]) -> Tuple[List[Tweet], FetchResult]:
+        job_id = await self.db.create_check_job(tweet_ids)
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            job = await self.db.get_check_job(job_id)
+            if job is None or job.status == CheckJobStatus.FAILED:
+                raise RuntimeError(f"Check job {job_id} failed")
+            if job.status == CheckJobStatus.DONE:
+                tweets = await self.db.get_all_active_tweets(tweet_ids)
+                return tweets, FetchResult(**job.result)
+        raise asyncio.TimeoutError(f"Check job {job_id} timed out")
+
+    async def close(self) -> None:
+        for task in list(self._waiting):
+            task.cancel()
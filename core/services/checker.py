@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from config import SHUTDOWN_TIMEOUT
+from core.db.database_handler import DatabaseHandler
+from core.db.tables import Tweet
+from core.services.app_config import app_config
+from core.services.budget import TickPlan
+from core.services.fetch_engine import ON_DEMAND, SWEEP, FetchEngine, FetchResult
+from core.services.growth import GrowthTracker, format_alert
+from core.services.notifier import Notifier
+from core.services.tweet_index import ActiveTweetIndex
+from core.services.tweet_state import TweetState, TweetStateStore
+from core.utils.logs import EventLogger
+from core.utils.profiling import TickProfiler
+from core.utils.tweet_stats import METRICS
+
+# Per-tweet lines are sampled by the "tweet_transition" rate of core.utils.logs
+transition_log = EventLogger("tweet_transition")
+tick_log = EventLogger("tick")
+
+
+class Checker:
+    """
+    Checks tracked tweets and turns state transitions into notifications
+    and DB writes.
+
+    check_tweets is the periodic sweep; check_now and enqueue serve
+    on-demand checks, e.g. right after /add, ahead of the sweep through
+    the fetch engine's priority limiter.
+    """
+
+    def __init__(self, db: DatabaseHandler, state_store: TweetStateStore):
+        self.db = db
+        self.state_store = state_store
+        self.engine = FetchEngine()
+        # Sweep and on-demand results are applied one batch at a time
+        self._apply_lock = asyncio.Lock()
+        self._background: Set[asyncio.Task] = set()
+        self.profiler = TickProfiler()
+        self.notifier = Notifier(db)
+        self.growth = GrowthTracker()
+        self.tweet_index = ActiveTweetIndex(db)
+
+        # Exposed on /metrics
+        self.ticks_total = 0
+        self.tick_failures_total = 0
+        self.tracked_tweets = 0
+        self.last_tick_duration = 0.0
+        self.last_tick_finished_at = 0.0
+        # Monotonic start of the last sweep, restored by WarmState
+        self.last_tick_started: Optional[float] = None
+        self.history_recorded_at: Optional[float] = None
+        # Monotonic start of the last sweep that checked a user with a
+        # check_interval_seconds quota
+        self._user_checked_at: Dict[int, float] = {}
+
+    async def check_tweets(self) -> None:
+        started = self.last_tick_started = time.monotonic()
+        stage = self.profiler.stage
+        try:
+            async with self.profiler.tick():
+                with stage("load"):
+                    tracked = await self.tweet_index.get()
+                    due, due_users, weights = await self._due_tweets(tracked, started)
+                    plan = self.engine.budget.plan(
+                        due,
+                        len(
+                            self.engine.communities.due(
+                                {t.community_id for t in due if t.community_id},
+                                app_config["top_size"],
+                            )
+                        ),
+                        started,
+                    )
+                    tweets = plan.tweets
+                self.tracked_tweets = len(tracked)
+                with stage("fetch"):
+                    fetch_started = time.monotonic()
+                    result = await self.engine.fetch(tweets, SWEEP, weights)
+                    self.engine.budget.record(
+                        tweets,
+                        len(result.stats) + plan.community_requests,
+                        time.monotonic() - fetch_started,
+                        started,
+                    )
+                self._user_checked_at.update(dict.fromkeys(due_users, started))
+                events = Counter()
+                with stage("analytics"):
+                    await self._check_growth(tweets, result, events)
+                async with self._apply_lock:
+                    with stage("notify"):
+                        deactivated, top_updates = await self._notify(
+                            tweets, result, events
+                        )
+                        events["messages"] += await self.notifier.commit()
+                    with stage("write"):
+                        await self._write(deactivated, top_updates)
+                    with stage("save"):
+                        # Deleted tweets keep their state until their rows leave the active set
+                        self.state_store.retain(tweet.id for tweet in tracked)
+                        self.growth.retain(tweet.tweet_id for tweet in tracked)
+                        self.engine.communities.retain(
+                            tweet.community_id for tweet in tracked
+                        )
+                        self.engine.budget.retain(tweet.tweet_id for tweet in tracked)
+                        await self.state_store.save()
+                with stage("history"):
+                    await self._record_history(tweets, result, started)
+                with stage("digest"):
+                    events["messages"] += await self.notifier.send_digests(
+                        tweets, result
+                    )
+            self._log_tick(
+                tracked, tweets, plan, result, events, deactivated, top_updates
+            )
+        except Exception:
+            self.tick_failures_total += 1
+            raise
+        finally:
+            self.ticks_total += 1
+            self.last_tick_duration = time.monotonic() - started
+            self.last_tick_finished_at = time.time()
+
+    async def check_now(
+        self, tweet_ids: Sequence[str]
+    ) -> Tuple[List[Tweet], FetchResult]:
+        tweets = await self.db.get_all_active_tweets(tweet_ids)
+        if not tweets:
+            return tweets, FetchResult()
+        result = await self.engine.fetch(tweets, ON_DEMAND)
+        async with self._apply_lock:
+            writes = await self._notify(tweets, result)
+            await self.notifier.commit()
+            await self._write(*writes)
+        return tweets, result
+
+    async def poll_communities(self) -> None:
+        """
+        Poll the community tops that are due between sweeps and check the
+        tweets that entered or left a changed top right away, so busy
+        communities get on-top alerts within community_poll_min_seconds
+        instead of the next sweep. Works from the tweets of the last sweep,
+        the index is only brought up to date by check_tweets.
+        """
+        by_community: Dict[str, List[Tweet]] = defaultdict(list)
+        for tweet in await self.tweet_index.current():
+            if tweet.community_id:
+                by_community[tweet.community_id].append(tweet)
+        due = self.engine.communities.due(by_community, app_config["top_size"])
+        if not due:
+            return
+        changed = await self.engine.poll_tops(due)
+        tweet_ids = {
+            tweet.tweet_id
+            for community_id, (previous, top) in changed.items()
+            for tweet in by_community[community_id]
+            if tweet.tweet_id in previous or tweet.tweet_id in top
+        }
+        if tweet_ids:
+            await self.check_now(list(tweet_ids))
+
+    def enqueue(self, tweet_ids: Sequence[str]) -> asyncio.Task:
+        """Schedule an on-demand check that outlives the caller."""
+        task = asyncio.create_task(self.check_now(tweet_ids))
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+        return task
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"On-demand check failed: {task.exception()}")
+
+    async def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Let on-demand checks finish within timeout, then flush notifications."""
+        if self._background:
+            _, unfinished = await asyncio.wait(list(self._background), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning(
+                    f"Cancelled {len(unfinished)} on-demand checks on shutdown"
+                )
+        await self.notifier.close()
+        await self.engine.close()
+        await self.tweet_index.stop()
+
+    def _log_tick(
+        self,
+        tracked: List[Tweet],
+        tweets: List[Tweet],
+        plan: TickPlan,
+        result: FetchResult,
+        events: Counter,
+        deactivated: Set[str],
+        top_updates: Dict[Tuple[str, str], bool],
+    ) -> None:
+        """One summary record per tick instead of a line per tweet."""
+        tick_log.info(
+            "Tick finished in {duration:.2f}s: {tweets} tweets, {deleted} deleted, "
+            "{entered_top} entered top, {left_top} left top, {alerts} alerts, "
+            "{notifications} notifications in {messages} messages, "
+            "{shed} postponed over budget",
+            duration=self.profiler.last_duration,
+            tweets=len(tweets),
+            not_due=len(tracked) - len(tweets) - len(plan.shed),
+            shed=len(plan.shed),
+            budget=plan.budget,
+            stats_requests=plan.stats_requests,
+            community_requests=plan.community_requests,
+            tweet_ids=len(result.stats),
+            communities=len(result.tops),
+            missing=sum(1 for stats in result.stats.values() if stats is None),
+            deleted=events["deleted"],
+            entered_top=events["entered_top"],
+            left_top=events["left_top"],
+            alerts=events["alerts"],
+            notifications=events["notifications"],
+            messages=events["messages"],
+            deactivated=len(deactivated),
+            top_updates=len(top_updates),
+            stages=self.profiler.last_stages,
+        )
+
+    async def _due_tweets(
+        self, tweets: List[Tweet], started: float
+    ) -> Tuple[List[Tweet], Set[int], Dict[int, int]]:
+        """
+        Tweets to check this sweep, the users with a check_interval_seconds
+        quota that are due and every user's fetch weight. A tweet is checked
+        when any of its subscribers is due; users without a quota always are.
+        """
+        users = await self.db.get_quota_users()
+        weights = {user.user_tg_id: user.fetch_weight for user in users}
+        intervals = {
+            user.user_tg_id: user.check_interval_seconds
+            for user in users
+            if user.check_interval_seconds
+        }
+        # Sweeps start check_interval_seconds apart, half of one is slack
+        slack = app_config["check_interval_seconds"] / 2
+        due_users = {
+            user_id
+            for user_id, interval in intervals.items()
+            if started - self._user_checked_at.get(user_id, -math.inf)
+            >= interval - slack
+        }
+        due = [
+            tweet
+            for tweet in tweets
+            if any(
+                subscription.user_id not in intervals
+                or subscription.user_id in due_users
+                for subscription in tweet.subscriptions
+            )
+        ]
+        return due, due_users, weights
+
+    async def _check_growth(
+        self, tweets: List[Tweet], result: FetchResult, events: Counter
+    ) -> None:
+        """
+        Feed the sweep's stats to the growth tracker and queue the alerts of
+        the users' threshold rules; they go out with this tick's messages.
+        """
+        self.growth.observe(result.stats)
+        rules = await self.db.get_alert_rules()
+        for alert in self.growth.check(rules, tweets):
+            self.notifier.add_block(alert.rule.user_id, format_alert(alert))
+            events["alerts"] += 1
+
+    async def _record_history(
+        self, tweets: List[Tweet], result: FetchResult, started: float
+    ) -> None:
+        """Append the sweep's stats to tweet_stats_history when it is due."""
+        interval = app_config["stats_history_interval_seconds"]
+        if interval <= 0:
+            return
+        last = self.history_recorded_at
+        if last is not None and started - last < interval:
+            return
+        samples = []
+        for tweet in tweets:
+            stats = result.stats.get(tweet.tweet_id)
+            if stats is None:
+                continue
+            rank = result.rank(tweet) if tweet.community_id else None
+            samples.append(
+                {
+                    "tweet_id": tweet.tweet_id,
+                    "community_id": tweet.community_id,
+                    **{metric: stats[metric] for metric in METRICS},
+                    "on_top": rank is not None if tweet.community_id else None,
+                    "rank": rank,
+                }
+            )
+        if samples:
+            await self.db.add_stats_history(samples)
+        self.history_recorded_at = started
+
+    async def _notify(
+        self,
+        tweets: List[Tweet],
+        result: FetchResult,
+        events: Optional[Counter] = None,
+    ) -> Tuple[Set[str], Dict[Tuple[str, str], bool]]:
+        """
+        Queue notifications about state transitions and return the DB writes
+        the observation calls for. Transitions and queued notifications are
+        counted into events.
+        """
+        if events is None:
+            events = Counter()
+        # Writes are deduplicated: one tweet_id may be tracked in several communities
+        deactivated = set()
+        top_updates = {}
+        for tweet in tweets:
+            current = TweetState(exists=result.stats.get(tweet.tweet_id) is not None)
+            if current.exists and tweet.community_id:
+                rank = result.rank(tweet)
+                current = TweetState(exists=True, on_top=rank is not None, rank=rank)
+
+            transition = self.state_store.diff(tweet, current)
+            if transition is not None:
+                kind, title = None, None
+                if transition.deleted:
+                    kind, title = "deleted", "❌⚠️ ПОСТ УДАЛЁН ⚠️❌"
+                elif transition.entered_top:
+                    kind, title = "entered_top", "✅⚠️ ПОСТ В ТОПЕ ⚠️✅"
+                elif transition.left_top:
+                    kind, title = "left_top", "❌⚠️ ПОСТ НЕ В ТОПЕ ⚠️❌"
+                if kind is not None:
+                    events[kind] += 1
+                    events["notifications"] += self.notifier.add(tweet, title)
+                    transition_log.info(
+                        "Tweet {tweet_id} {transition}",
+                        tweet_id=tweet.tweet_id,
+                        community_id=tweet.community_id,
+                        transition=kind,
+                    )
+                self.state_store.commit(tweet, current)
+
+            # The DB row is compared with the observation rather than the snapshot,
+            # so a failed write is retried on the next tick without a new message
+            if not current.exists:
+                deactivated.add(tweet.tweet_id)
+            elif current.on_top is not None and current.on_top != tweet.on_top:
+                top_updates[(tweet.tweet_id, tweet.community_id)] = current.on_top
+        return deactivated, top_updates
+
+    async def _write(
+        self, deactivated: Set[str], top_updates: Dict[Tuple[str, str], bool]
+    ) -> None:
+        for tweet_id in deactivated:
+            await self.db.set_as_inactive(tweet_id)
+        for (tweet_id, community_id), status in top_updates.items():
+            await self.db.set_on_top_status(tweet_id, community_id, status)
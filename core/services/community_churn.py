@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from core.services.app_config import app_config
+
+# Polls per expected change of a top: 2 catches most changes within half
+# of the time between them
+CHURN_TARGET = 0.5
+# Weight kept by the history at every poll, about the last 10 polls count
+CHURN_DECAY = 0.9
+
+
+def fingerprint(top: Sequence[str]) -> str:
+    return hashlib.blake2b("\n".join(top).encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class CommunityPolls:
+    top: List[str]
+    top_size: int
+    fingerprint: str
+    polled_at: float
+    # Decayed sums of observed changes and of the seconds they were seen in
+    changes: float
+    seconds: float
+    interval: float = field(default=0.0)
+
+
+class CommunityChurn:
+    """
+    How often the top of each community changes, and when to poll it next.
+
+    Every poll is fingerprinted by a hash of the top tweet ids. Changes and
+    the time between polls are summed with decay, which gives the recent
+    change rate, and the next poll follows after CHURN_TARGET / rate
+    seconds within community_poll_min_seconds and
+    community_poll_max_seconds. Until a community has a history it is
+    polled at the minimum interval.
+    """
+
+    def __init__(self):
+        self._communities: Dict[str, CommunityPolls] = {}
+
+        # Exposed on /metrics
+        self.polled_total = 0
+        self.reused_total = 0
+        self.changed_total = 0
+
+    def __len__(self) -> int:
+        return len(self._communities)
+
+    def due(
+        self,
+        community_ids: Iterable[str],
+        top_size: int,
+        now: Optional[float] = None,
+    ) -> List[str]:
+        now = time.monotonic() if now is None else now
+        due = []
+        for community_id in community_ids:
+            polls = self._communities.get(community_id)
+            if (
+                polls is None
+                or polls.top_size != top_size
+                or now - polls.polled_at >= polls.interval
+            ):
+                due.append(community_id)
+        return due
+
+    def top(self, community_id: str) -> Optional[List[str]]:
+        """The last polled top, for communities that are not due."""
+        polls = self._communities.get(community_id)
+        return polls.top if polls is not None else None
+
+    def observe(
+        self,
+        community_id: str,
+        top: List[str],
+        top_size: int,
+        now: Optional[float] = None,
+    ) -> bool:
+        """Record a poll, returns whether the top changed since the last one."""
+        now = time.monotonic() if now is None else now
+        self.polled_total += 1
+        low = app_config["community_poll_min_seconds"]
+        high = max(low, app_config["community_poll_max_seconds"])
+        current = fingerprint(top)
+        polls = self._communities.get(community_id)
+        if polls is None or polls.top_size != top_size:
+            # Prior of one change per minimum interval, outweighed in a few polls
+            polls = self._communities[community_id] = CommunityPolls(
+                top=top,
+                top_size=top_size,
+                fingerprint=current,
+                polled_at=now,
+                changes=1.0,
+                seconds=low / CHURN_TARGET,
+            )
+            changed = False
+        else:
+            changed = current != polls.fingerprint
+            polls.changes = polls.changes * CHURN_DECAY + changed
+            polls.seconds = polls.seconds * CHURN_DECAY + (now - polls.polled_at)
+            polls.top, polls.fingerprint, polls.polled_at = top, current, now
+            self.changed_total += changed
+
+        rate = polls.changes / polls.seconds if polls.seconds > 0 else 0.0
+        interval = CHURN_TARGET / rate if rate > 0 else high
+        polls.interval = min(high, max(low, interval))
+        return changed
+
+    def interval(self, community_id: str) -> Optional[float]:
+        polls = self._communities.get(community_id)
+        return polls.interval if polls is not None else None
+
+    def retain(self, community_ids: Iterable[str]) -> None:
+        """Forget communities that are no longer tracked."""
+        keep = set(community_ids)
+        for community_id in [c for c in self._communities if c not in keep]:
+            del self._communities[community_id]
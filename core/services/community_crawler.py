@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+from typing import Optional, Set
+
+from loguru import logger
+
+from core.db.database_handler import DatabaseHandler
+from core.services.app_config import app_config
+from core.services.fetch_engine import FetchEngine
+
+
+class CommunityCrawler:
+    """
+    Pages through the ranked timelines of tracked communities and records
+    every tweet's position in community_timeline_entries.
+
+    A checkpoint is written after each page, so a crawl cut short by
+    crawl_max_pages or a failure resumes from the stored cursor on the next
+    run. A pass ends at the last page or at the first page whose tweets are
+    all already stored at the same positions; the next pass starts from the
+    top again. Entries the pass did not see are deleted when it ends: all
+    of them after the last page, only those ranked above the stop otherwise.
+
+    While sweeps shed load (see RequestBudget) a crawl only refreshes the
+    first page and leaves the checkpoint alone, so the pass resumes where
+    it stopped once they no longer do.
+    """
+
+    def __init__(self, db: DatabaseHandler, engine: FetchEngine):
+        self.db = db
+        self.engine = engine
+        # Monotonic start of the last pass, restored by WarmState
+        self.last_crawl_started: Optional[float] = None
+
+    async def crawl_all(self) -> None:
+        self.last_crawl_started = time.monotonic()
+        for community_id in await self.db.get_tracked_community_ids():
+            try:
+                await self.crawl(community_id)
+            except Exception as e:
+                logger.warning(f"Crawl of community {community_id} failed: {e}")
+
+    async def crawl(self, community_id: str) -> int:
+        """Crawl up to crawl_max_pages pages, returns how many were fetched."""
+        if self.engine.budget.shedding:
+            return await self.crawl_top(community_id)
+        checkpoint = await self.db.get_crawl_checkpoint(community_id)
+        if (
+            checkpoint is not None
+            and not checkpoint.is_complete
+            and checkpoint.cursor is not None
+            and checkpoint.pass_started_at is not None
+        ):
+            cursor, position = checkpoint.cursor, checkpoint.next_position
+            pass_started_at = checkpoint.pass_started_at
+            # Ranked timelines may repeat a tweet on a later page, also one
+            # saved before the pass was interrupted
+            seen = await self.db.get_crawl_pass_tweet_ids(community_id, pass_started_at)
+        else:
+            cursor, position = None, 1
+            pass_started_at = await self.db.start_crawl_pass(community_id)
+            seen: Set[str] = set()
+
+        pages = 0
+        while pages < app_config["crawl_max_pages"]:
+            tweet_ids, next_cursor = await self.engine.fetch_timeline_page(
+                community_id, cursor, app_config["crawl_page_size"]
+            )
+            pages += 1
+
+            entries = []
+            for tweet_id in tweet_ids:
+                if tweet_id not in seen:
+                    seen.add(tweet_id)
+                    entries.append((tweet_id, position))
+                    position += 1
+            changed = await self.db.save_timeline_entries(community_id, entries)
+
+            # A page of tweets already seen by this pass is no sign of the end
+            reached_end = not tweet_ids or not next_cursor
+            if reached_end or (entries and changed == 0):
+                # Past an early stop the stored entries are still current
+                pruned = await self.db.prune_timeline_entries(
+                    community_id, pass_started_at, None if reached_end else position
+                )
+                await self.db.save_crawl_checkpoint(community_id, None, 1, True)
+                logger.info(
+                    f"Crawl of community {community_id} finished at position "
+                    f"{position - 1}, {pruned} stale entries removed"
+                )
+                break
+            cursor = next_cursor
+            await self.db.save_crawl_checkpoint(community_id, cursor, position, False)
+        return pages
+
+    async def crawl_top(self, community_id: str) -> int:
+        """Save the first page only, without touching the checkpoint."""
+        tweet_ids, next_cursor = await self.engine.fetch_timeline_page(
+            community_id, None, app_config["crawl_page_size"]
+        )
+        entries = [
+            (tweet_id, position)
+            for position, tweet_id in enumerate(dict.fromkeys(tweet_ids), 1)
+        ]
+        await self.db.save_timeline_entries(community_id, entries)
+        if next_cursor:
+            self.engine.budget.shed_crawl_page()
+        return 1
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from curl_cffi.requests import AsyncSession
+from loguru import logger
+
+from config import CACHE_PREFIX, CACHE_URL
+from core.db.tables import Tweet
+from core.services.app_config import app_config
+from core.services.budget import RequestBudget
+from core.services.community_churn import CommunityChurn
+from core.utils.cache import Cache, create_cache
+from core.utils.cassette import create_session
+from core.utils.x_community_checker import (
+    get_community_top,
+    get_community_tweet_ids,
+)
+from core.utils.x_post_checker import get_guest_token, get_tweet_stats, pick_browser
+
+# PriorityLimiter levels, lower values are served first
+ON_DEMAND = 0
+SWEEP = 1
+CRAWL = 2
+
+# Guest tokens are refreshed well before X expires them
+GUEST_TOKEN_TTL = 30 * 60
+GUEST_TOKEN_KEY = "guest_token"
+
+
+class PriorityLimiter:
+    """
+    Concurrency limiter whose waiters form a priority queue.
+
+    A freed slot goes to the waiter with the lowest priority value, FIFO
+    within one level, so on-demand requests overtake a running sweep.
+    The limit is read through a callable and may change at runtime.
+    """
+
+    def __init__(self, limit: Callable[[], int]):
+        self._limit = limit
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int) -> None:
+        if not self._waiters and self._active < self._limit():
+            self._active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was already handed over, pass it on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self._active -= 1
+        while self._waiters and self._active < self._limit():
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def fair_order(
+    tweets: List[Tweet], weights: Optional[Dict[int, int]] = None
+) -> List[str]:
+    """
+    Unique tweet_ids in deficit round-robin order over their subscribers.
+
+    Every round each user's deficit grows by their weight (1 by default)
+    and one of their tweets is queued per whole unit of it, so a user
+    waits for about as many requests of the others as they have tweets
+    themselves, however many the others track. A tweet shared by several
+    users is queued once, in the turn of the first user to reach it, and
+    costs the others nothing. Tweets need their subscriptions loaded.
+    """
+    weights = weights or {}
+    queues: Dict[Optional[int], Deque[str]] = {}
+    for tweet in tweets:
+        for user_id in {s.user_id for s in tweet.subscriptions} or {None}:
+            queues.setdefault(user_id, deque()).append(tweet.tweet_id)
+
+    order: Dict[str, None] = {}
+    deficits = dict.fromkeys(queues, 0)
+    while queues:
+        for user_id in list(queues):
+            queue = queues[user_id]
+            deficits[user_id] += max(1, weights.get(user_id, 1))
+            while queue and deficits[user_id] >= 1:
+                tweet_id = queue.popleft()
+                if tweet_id not in order:
+                    order[tweet_id] = None
+                    deficits[user_id] -= 1
+            if not queue:
+                del queues[user_id]
+    return list(order)
+
+
+@dataclass
+class FetchResult:
+    # tweet_id -> extract_tweet_stats() result, None if the tweet is gone
+    stats: Dict[str, Optional[Dict[str, Any]]] = field(default_factory=dict)
+    # community_id -> top tweet ids in ranking order
+    tops: Dict[str, List[str]] = field(default_factory=dict)
+
+    def rank(self, tweet: Tweet) -> Optional[int]:
+        top = self.tops.get(tweet.community_id)
+        if not top or tweet.tweet_id not in top:
+            return None
+        return top.index(tweet.tweet_id) + 1
+
+
+class FetchEngine:
+    """
+    Long-lived X client shared by the periodic sweep and on-demand checks.
+
+    Keeps one warm curl_cffi session and guest token, fetches every tweet
+    and every community top once per call and bounds the number of
+    requests in flight with a PriorityLimiter.
+
+    The guest token always goes through the cache, tweet stats and tops
+    while fetch_cache_seconds is set; with a shared cache (CACHE_URL)
+    checker nodes reuse each other's token and results. Community tops are
+    only polled when due by their churn, see CommunityChurn, and reused
+    from the last poll otherwise.
+    """
+
+    def __init__(self, cache: Optional[Cache] = None):
+        self.limiter = PriorityLimiter(lambda: app_config["fetch_concurrency"])
+        self.cache = (
+            cache if cache is not None else create_cache(CACHE_URL, CACHE_PREFIX)
+        )
+        self._session: Optional[AsyncSession] = None
+        self._guest_token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self.communities = CommunityChurn()
+        self.budget = RequestBudget()
+
+    async def _warm(self) -> Tuple[AsyncSession, str]:
+        async with self._token_lock:
+            if self._session is None:
+                self._session = create_session(pick_browser())
+            if self._guest_token is None or time.monotonic() >= self._token_expires_at:
+                data = await self.cache.get_or_load(
+                    GUEST_TOKEN_KEY, self._new_token, GUEST_TOKEN_TTL
+                )
+                self._guest_token = data["guest_token"]
+                remaining = data["expires_at"] - time.time()
+                self._token_expires_at = time.monotonic() + remaining
+            return self._session, self._guest_token
+
+    async def _new_token(self) -> Dict[str, Any]:
+        return {
+            "guest_token": await get_guest_token(self._session),
+            "expires_at": time.time() + GUEST_TOKEN_TTL,
+        }
+
+    async def warm(self) -> None:
+        """Open the session and get a guest token ahead of the first fetch."""
+        try:
+            await self._warm()
+        except Exception as e:
+            # The first fetch retries
+            logger.warning(f"Fetch engine warm-up failed: {e}")
+
+    async def invalidate_token(self) -> None:
+        token, self._guest_token = self._guest_token, None
+        cached = await self.cache.get(GUEST_TOKEN_KEY)
+        # Another node may have replaced it already
+        if token is not None and cached and cached["guest_token"] == token:
+            await self.cache.delete(GUEST_TOKEN_KEY)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The guest token with its expiry as a wall clock time."""
+        if self._guest_token is None:
+            return {}
+        remaining = self._token_expires_at - time.monotonic()
+        return {
+            "guest_token": self._guest_token,
+            "token_expires_at": time.time() + remaining,
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        remaining = data.get("token_expires_at", 0) - time.time()
+        if data.get("guest_token") and remaining > 0:
+            self._guest_token = data["guest_token"]
+            self._token_expires_at = time.monotonic() + remaining
+
+    async def close(self) -> None:
+        # The guest token outlives the session, see snapshot()
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+        await self.cache.close()
+
+    async def fetch(
+        self,
+        tweets: List[Tweet],
+        priority: int = SWEEP,
+        weights: Optional[Dict[int, int]] = None,
+    ) -> FetchResult:
+        """
+        Stats of every tweet and the top of every community. Within a
+        priority level requests are served in the order they are queued,
+        so tweets are queued fairly across users, see fair_order().
+        """
+        session, guest_token = await self._warm()
+        top_size = app_config["top_size"]
+        cache_ttl = app_config["fetch_cache_seconds"]
+        now = time.monotonic()
+        tweet_ids = fair_order(tweets, weights)
+        community_ids = list(
+            dict.fromkeys(tweet.community_id for tweet in tweets if tweet.community_id)
+        )
+        polled = self.communities.due(community_ids, top_size, now)
+        stats_keys = {tweet_id: f"tweet_stats:{tweet_id}" for tweet_id in tweet_ids}
+        top_keys = {
+            community_id: f"community_top:{community_id}:{top_size}"
+            for community_id in polled
+        }
+        # One round trip for everything other nodes fetched recently
+        cached = {}
+        if cache_ttl > 0:
+            cached = await self.cache.get_many(
+                [*stats_keys.values(), *top_keys.values()]
+            )
+
+        async def cached_call(key: str, call: Callable[[], Any]) -> Any:
+            if key in cached:
+                return cached[key]
+            async with self.limiter.slot(priority):
+                if cache_ttl > 0:
+                    return await self.cache.get_or_load(key, call, cache_ttl)
+                return await call()
+
+        async def fetch_stats(tweet_id: str) -> Optional[Dict[str, Any]]:
+            return await cached_call(
+                stats_keys[tweet_id],
+                lambda: get_tweet_stats(tweet_id, guest_token, session),
+            )
+
+        async def fetch_top(community_id: str) -> List[str]:
+            return await cached_call(
+                top_keys[community_id],
+                lambda: get_community_top(community_id, guest_token, session, top_size),
+            )
+
+        try:
+            # Tops are queued first, every subscriber of a community needs them
+            tops, stats = await asyncio.gather(
+                asyncio.gather(*(fetch_top(community) for community in polled)),
+                asyncio.gather(*(fetch_stats(tweet_id) for tweet_id in tweet_ids)),
+            )
+        except Exception:
+            # Most failures are an expired or throttled token
+            await self.invalidate_token()
+            raise
+
+        for community_id, top in zip(polled, tops):
+            self.communities.observe(community_id, top, top_size, now)
+        self.communities.reused_total += len(community_ids) - len(polled)
+        return FetchResult(
+            stats=dict(zip(tweet_ids, stats)),
+            tops={
+                community_id: self.communities.top(community_id)
+                for community_id in community_ids
+            },
+        )
+
+    async def poll_tops(
+        self, community_ids: List[str], priority: int = SWEEP
+    ) -> Dict[str, Tuple[List[str], List[str]]]:
+        """
+        Poll community tops outside a sweep, returns the previous and the
+        new top of every community whose top changed.
+        """
+        session, guest_token = await self._warm()
+        top_size = app_config["top_size"]
+        now = time.monotonic()
+
+        async def poll(community_id: str) -> List[str]:
+            async with self.limiter.slot(priority):
+                return await get_community_top(
+                    community_id, guest_token, session, top_size
+                )
+
+        try:
+            tops = await asyncio.gather(
+                *(poll(community) for community in community_ids)
+            )
+        except Exception:
+            await self.invalidate_token()
+            raise
+
+        changed = {}
+        for community_id, top in zip(community_ids, tops):
+            previous = self.communities.top(community_id) or []
+            if self.communities.observe(community_id, top, top_size, now):
+                changed[community_id] = (previous, top)
+        return changed
+
+    async def fetch_timeline_page(
+        self,
+        community_id: str,
+        cursor: Optional[str] = None,
+        count: int = 20,
+        priority: int = CRAWL,
+    ) -> Tuple[List[str], Optional[str]]:
+        """Fetch one page of a community timeline, returns (tweet_ids, next cursor)."""
+        session, guest_token = await self._warm()
+        try:
+            async with self.limiter.slot(priority):
+                page = await get_community_tweet_ids(
+                    community_id, count, guest_token, cursor, session
+                )
+        except Exception:
+            await self.invalidate_token()
+            raise
+        return page["tweet_ids"], page["cursor"]
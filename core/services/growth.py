@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import html
+import math
+import time
+from itertools import chain
+from operator import itemgetter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import GROWTH_WINDOW
+from core.db.tables import AlertRule, Tweet
+from core.services.app_config import app_config
+from core.utils.tweet_stats import METRIC_LABELS, METRICS
+
+METRIC_COLUMNS = {metric: column for column, metric in enumerate(METRICS)}
+_metric_values = itemgetter(*METRICS)
+INITIAL_CAPACITY = 1024
+
+
+@dataclass
+class Alert:
+    rule: AlertRule
+    tweet: Tweet
+    value: int
+    # Growth within the rule's window, equal to value for level rules
+    growth: int
+    # Smoothed growth per minute
+    velocity: float
+
+
+def format_alert(alert: Alert) -> str:
+    rule = alert.rule
+    label = METRIC_LABELS[rule.metric]
+    if rule.window_minutes:
+        headline = f"📈 {label} +{alert.growth} за {rule.window_minutes} мин."
+    else:
+        headline = f"📈 {label} {alert.value} (порог {rule.threshold})"
+    return (
+        f"{headline}\n"
+        f"Tweet Url: {html.escape(alert.tweet.tweet_url)}\n"
+        f"Сейчас {alert.value}, ≈{alert.velocity:.0f}/мин.\n"
+    )
+
+
+class GrowthTracker:
+    """
+    Recent stats of every tracked tweet in NumPy arrays indexed by slot.
+
+    Each tweet_id owns a slot with a ring buffer of its last `window`
+    samples, the latest and previous values and an exponentially weighted
+    velocity whose half-life is growth_half_life_seconds. observe() updates
+    all of them with a few array operations per tick, and rules are checked
+    against whole slot arrays at once, so the cost per tweet is constant
+    and no per-tweet history is walked in Python.
+    """
+
+    def __init__(self, window: int = GROWTH_WINDOW, capacity: int = INITIAL_CAPACITY):
+        self.window = window
+        self.slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._capacity = 0
+        metrics = len(METRICS)
+        self.times = np.empty((0, window))
+        self.samples = np.empty((0, window, metrics))
+        self.head = np.empty(0, dtype=np.int64)
+        self.last_time = np.empty(0)
+        self.last = np.empty((0, metrics))
+        self.previous = np.empty((0, metrics))
+        self.velocity = np.empty((0, metrics))
+        self._grow(capacity)
+        # (rule id, tweet_id) -> when a growth rule last fired for the tweet
+        self._fired: Dict[Tuple[int, str], float] = {}
+        self.observed_at = math.nan
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - self._capacity
+
+        def pad(array: np.ndarray, fill: float) -> np.ndarray:
+            tail = np.full((extra, *array.shape[1:]), fill, dtype=array.dtype)
+            return np.concatenate([array, tail])
+
+        self.times = pad(self.times, np.nan)
+        self.samples = pad(self.samples, 0)
+        self.head = pad(self.head, 0)
+        self.last_time = pad(self.last_time, np.nan)
+        self.last = pad(self.last, np.nan)
+        self.previous = pad(self.previous, np.nan)
+        self.velocity = pad(self.velocity, np.nan)
+        self._free.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def _slot(self, tweet_id: str) -> int:
+        slot = self.slots.get(tweet_id)
+        if slot is None:
+            if not self._free:
+                self._grow(self._capacity * 2)
+            slot = self.slots[tweet_id] = self._free.pop()
+        return slot
+
+    def _clear(self, slots: np.ndarray) -> None:
+        self.times[slots] = np.nan
+        self.head[slots] = 0
+        self.last_time[slots] = np.nan
+        self.last[slots] = np.nan
+        self.previous[slots] = np.nan
+        self.velocity[slots] = np.nan
+
+    def observe(
+        self,
+        stats: Dict[str, Optional[Dict[str, Any]]],
+        now: Optional[float] = None,
+    ) -> None:
+        """Record one sample for every tweet that was found."""
+        now = time.time() if now is None else now
+        found = [(tweet_id, row) for tweet_id, row in stats.items() if row is not None]
+        if not found:
+            return
+        slots = np.fromiter(
+            (self._slot(tweet_id) for tweet_id, _ in found), np.int64, len(found)
+        )
+        values = np.fromiter(
+            chain.from_iterable(_metric_values(row) for _, row in found),
+            np.float64,
+            len(found) * len(METRICS),
+        ).reshape(len(found), len(METRICS))
+
+        elapsed = now - self.last_time[slots]
+        # First samples and repeated timestamps leave the velocity alone, the
+        # second one starts it at the measured rate
+        moved = elapsed > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = (values - self.last[slots]) / elapsed[:, None] * 60
+        tau = app_config["growth_half_life_seconds"] / math.log(2)
+        alpha = np.where(moved, 1 - np.exp(-np.where(moved, elapsed, 0) / tau), 0)
+        velocity = self.velocity[slots]
+        smoothed = np.where(
+            np.isnan(velocity), rate, velocity + alpha[:, None] * (rate - velocity)
+        )
+        self.velocity[slots] = np.where(moved[:, None], smoothed, velocity)
+
+        head = self.head[slots]
+        self.times[slots, head] = now
+        self.samples[slots, head] = values
+        self.head[slots] = (head + 1) % self.window
+        self.previous[slots] = self.last[slots]
+        self.last[slots] = values
+        self.last_time[slots] = now
+        self.observed_at = now
+
+    def growth(
+        self, slots: np.ndarray, column: int, seconds: float, now: float
+    ) -> np.ndarray:
+        """
+        Growth of a metric since the oldest sample within the last seconds,
+        per slot. Windows longer than the ring buffer are cut to its span.
+        """
+        times = self.times[slots]
+        with np.errstate(invalid="ignore"):
+            in_window = times >= now - seconds
+        oldest = np.where(in_window, times, np.inf).argmin(axis=1)
+        base = self.samples[slots, oldest, column]
+        growth = self.last[slots, column] - base
+        return np.where(in_window.any(axis=1), growth, 0)
+
+    def retain(self, tweet_ids: Iterable[str]) -> None:
+        """Free the slots of tweets that are no longer tracked."""
+        keep = set(tweet_ids)
+        gone = [tweet_id for tweet_id in self.slots if tweet_id not in keep]
+        if not gone:
+            return
+        slots = np.array([self.slots.pop(tweet_id) for tweet_id in gone])
+        self._clear(slots)
+        self._free.extend(slots.tolist())
+        gone_ids = set(gone)
+        self._fired = {
+            key: at for key, at in self._fired.items() if key[1] not in gone_ids
+        }
+
+    def save(self, path: str) -> None:
+        """Write the arrays and slot map to an .npz file; times are wall clock."""
+        fired = list(self._fired.items())
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                times=self.times,
+                samples=self.samples,
+                head=self.head,
+                last_time=self.last_time,
+                last=self.last,
+                previous=self.previous,
+                velocity=self.velocity,
+                slot_ids=np.array(list(self.slots), dtype=np.str_),
+                slot_index=np.fromiter(self.slots.values(), np.int64, len(self.slots)),
+                fired_rules=np.array([rule for (rule, _), _ in fired], dtype=np.int64),
+                fired_tweets=np.array(
+                    [tweet for (_, tweet), _ in fired], dtype=np.str_
+                ),
+                fired_at=np.array([at for _, at in fired], dtype=np.float64),
+                observed_at=np.float64(self.observed_at),
+            )
+
+    def load(self, path: str) -> None:
+        """Replace the state with a save() of a tracker with the same window."""
+        with np.load(path, allow_pickle=False) as data:
+            if data["times"].shape[1] != self.window:
+                raise ValueError(
+                    f"window {data['times'].shape[1]} does not match {self.window}"
+                )
+            self.times = data["times"]
+            self.samples = data["samples"]
+            self.head = data["head"]
+            self.last_time = data["last_time"]
+            self.last = data["last"]
+            self.previous = data["previous"]
+            self.velocity = data["velocity"]
+            self.slots = dict(
+                zip(data["slot_ids"].tolist(), data["slot_index"].tolist())
+            )
+            self._fired = {
+                (rule, tweet): at
+                for rule, tweet, at in zip(
+                    data["fired_rules"].tolist(),
+                    data["fired_tweets"].tolist(),
+                    data["fired_at"].tolist(),
+                )
+            }
+            self.observed_at = float(data["observed_at"])
+        self._capacity = len(self.times)
+        used = set(self.slots.values())
+        self._free = [
+            slot for slot in range(self._capacity - 1, -1, -1) if slot not in used
+        ]
+
+    def check(
+        self,
+        rules: Sequence[AlertRule],
+        tweets: Sequence[Tweet],
+        now: Optional[float] = None,
+    ) -> List[Alert]:
+        """
+        Alerts for rules crossed by the last observe(). Level rules fire once
+        when the metric crosses the threshold, growth rules at most once per
+        window and tweet.
+        """
+        now = time.time() if now is None else now
+        if not rules:
+            return []
+        # One tweet_id may be tracked in several communities, alert once
+        tweets_by_user: Dict[int, Dict[str, Tweet]] = {}
+        for tweet in tweets:
+            if tweet.tweet_id not in self.slots:
+                continue
+            for subscription in tweet.subscriptions:
+                user_tweets = tweets_by_user.setdefault(subscription.user_id, {})
+                user_tweets.setdefault(tweet.tweet_id, tweet)
+
+        alerts: List[Alert] = []
+        for rule in rules:
+            user_tweets = list(tweets_by_user.get(rule.user_id, {}).values())
+            column = METRIC_COLUMNS.get(rule.metric)
+            if not user_tweets or column is None:
+                continue
+            slots = np.fromiter(
+                (self.slots[tweet.tweet_id] for tweet in user_tweets),
+                np.int64,
+                len(user_tweets),
+            )
+            current = self.last[slots, column]
+            if rule.window_minutes:
+                growth = self.growth(slots, column, rule.window_minutes * 60, now)
+                fired = np.flatnonzero(growth >= rule.threshold)
+            else:
+                growth = current
+                # Tweets missing from the last observation keep their old values
+                with np.errstate(invalid="ignore"):
+                    fired = np.flatnonzero(
+                        (self.last_time[slots] == self.observed_at)
+                        & (self.previous[slots, column] < rule.threshold)
+                        & (current >= rule.threshold)
+                    )
+
+            for index in fired.tolist():
+                tweet = user_tweets[index]
+                if rule.window_minutes:
+                    key = (rule.id, tweet.tweet_id)
+                    if now - self._fired.get(key, -math.inf) < rule.window_minutes * 60:
+                        continue
+                    self._fired[key] = now
+                alerts.append(
+                    Alert(
+                        rule=rule,
+                        tweet=tweet,
+                        value=int(current[index]),
+                        growth=int(growth[index]),
+                        velocity=float(self.velocity[slots[index], column]),
+                    )
+                )
+        return alerts
@@ -0,0 +1,202 @@
+"""
+Columnar export of tweet_stats_history for offline analysis.
+
+Rows are streamed from a server-side cursor one batch at a time and
+written as Parquet or Arrow IPC files partitioned by day and community:
+
+    <out>/date=2026-10-19/community=<community_id|none>/part.parquet
+
+Every day is read ordered by community, so only one file is open at a time
+and memory stays bounded by the batch size however long the range is.
+pyarrow is optional and only needed here (not in requirements.txt):
+
+    python -m core.services.history_export --since 2026-10-01 --out exports
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Any, List, Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import select
+
+from config import DB_URL
+from core.db.database_handler import DatabaseHandler
+from core.db.tables import TweetStatsSample
+from core.utils.tweet_stats import METRICS
+
+# Rows fetched from the cursor and converted to Arrow at a time
+EXPORT_BATCH_SIZE = 10_000
+FORMATS = ("parquet", "arrow")
+COLUMNS = (
+    TweetStatsSample.observed_at,
+    TweetStatsSample.tweet_id,
+    TweetStatsSample.community_id,
+    *(getattr(TweetStatsSample, metric) for metric in METRICS),
+    TweetStatsSample.on_top,
+    TweetStatsSample.rank,
+)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("History export needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def history_schema(pa) -> Any:
+    return pa.schema(
+        [
+            ("observed_at", pa.timestamp("us")),
+            ("tweet_id", pa.string()),
+            ("community_id", pa.string()),
+            *((metric, pa.int64()) for metric in METRICS),
+            ("on_top", pa.bool_()),
+            ("rank", pa.int32()),
+        ]
+    )
+
+
+def partition_path(directory: str, day: date, community_id: Optional[str], fmt: str):
+    return os.path.join(
+        directory,
+        f"date={day.isoformat()}",
+        f"community={community_id or 'none'}",
+        f"part.{fmt}",
+    )
+
+
+class PartitionWriter:
+    """One Parquet or Arrow IPC file, written a record batch at a time."""
+
+    def __init__(self, pa, schema, path: str, fmt: str):
+        self.pa = pa
+        self.schema = schema
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, schema)
+        self.rows = 0
+
+    def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        columns = zip(*rows)
+        table = self.pa.Table.from_arrays(
+            [
+                self.pa.array(column, type=field.type)
+                for column, field in zip(columns, self.schema)
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+async def export_history(
+    db: DatabaseHandler,
+    directory: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    fmt: str = "parquet",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> List[str]:
+    """
+    Export the days from since to until (inclusive, default: all stored
+    history) and return the written files. Conversion and file writes run
+    in a thread so a bot or checker sharing the loop keeps running.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    pa = import_pyarrow()
+    if since is None or until is None:
+        stored = await db.get_stats_history_range()
+        if stored is None:
+            return []
+        since = since or stored[0].date()
+        until = until or stored[1].date()
+
+    schema = history_schema(pa)
+    paths: List[str] = []
+    day = since
+    while day <= until:
+        paths += await _export_day(db, pa, schema, directory, day, fmt, batch_size)
+        day += timedelta(days=1)
+    return paths
+
+
+async def _export_day(
+    db: DatabaseHandler,
+    pa,
+    schema,
+    directory: str,
+    day: date,
+    fmt: str,
+    batch_size: int,
+) -> List[str]:
+    start = datetime.combine(day, datetime.min.time())
+    stmt = (
+        select(*COLUMNS)
+        .where(
+            TweetStatsSample.observed_at >= start,
+            TweetStatsSample.observed_at < start + timedelta(days=1),
+        )
+        .order_by(TweetStatsSample.community_id, TweetStatsSample.observed_at)
+        .execution_options(yield_per=batch_size)
+    )
+    paths: List[str] = []
+    writer: Optional[PartitionWriter] = None
+    try:
+        async with db.engine.connect() as conn:
+            result = await conn.stream(stmt)
+            async for rows in result.partitions():
+                # community_id is the third column; a partition may span batches
+                for community_id, group in groupby(rows, key=lambda row: row[2]):
+                    path = partition_path(directory, day, community_id, fmt)
+                    if writer is None or writer.path != path:
+                        if writer is not None:
+                            await asyncio.to_thread(writer.close)
+                        writer = await asyncio.to_thread(
+                            PartitionWriter, pa, schema, path, fmt
+                        )
+                        paths.append(path)
+                    await asyncio.to_thread(writer.write, list(group))
+    finally:
+        if writer is not None:
+            await asyncio.to_thread(writer.close)
+    if paths:
+        logger.info(f"Exported stats history of {day} to {len(paths)} files")
+    return paths
+
+
+async def _main(args: argparse.Namespace) -> None:
+    db = DatabaseHandler(DB_URL)
+    try:
+        paths = await export_history(
+            db, args.out, args.since, args.until, args.format, args.batch_size
+        )
+    finally:
+        await db.close()
+    print(f"{len(paths)} files written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    asyncio.run(_main(parser.parse_args()))
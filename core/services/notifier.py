@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import html
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+from core.db.database_handler import DatabaseHandler
+from core.db.tables import Tweet
+from core.services.app_config import app_config
+from core.services.fetch_engine import FetchResult
+from core.utils.telegram import send_message
+
+# Telegram rejects longer messages
+MESSAGE_LIMIT = 4096
+# Longest retry_after of a rate limited message that is waited out
+MAX_RETRY_AFTER = 30
+
+
+def format_tweet_message(title: str, tweet: Tweet) -> str:
+    text = (
+        f"{title}\n"
+        f"Tweet Url: {html.escape(tweet.tweet_url)}\n"
+        f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
+    )
+    if tweet.community_id:
+        text += f"Community URL: https://x.com/i/communities/{tweet.community_id}\n"
+    return text
+
+
+def format_check_status(tweet: Tweet, result: FetchResult) -> str:
+    text = f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
+    stats = result.stats.get(tweet.tweet_id)
+    if stats is None:
+        return text + "❌ Пост не найден\n"
+    text += (
+        f"👁 {stats['views_count']} ❤️ {stats['favorite_count']} "
+        f"🔁 {stats['retweet_count']} 💬 {stats['reply_count']} "
+        f"🔖 {stats['bookmark_count']}\n"
+    )
+    if tweet.community_id:
+        rank = result.rank(tweet)
+        text += f"✅ В топе (#{rank})\n" if rank else "❌ Не в топе\n"
+    return text
+
+
+def split_message(blocks: Iterable[str]) -> List[str]:
+    """Join blocks with blank lines into as few messages as fit the limit."""
+    messages: List[str] = []
+    current = ""
+    for block in blocks:
+        block = block[:MESSAGE_LIMIT]
+        candidate = f"{current}\n{block}" if current else block
+        if len(candidate) > MESSAGE_LIMIT:
+            messages.append(current)
+            candidate = block
+        current = candidate
+    if current:
+        messages.append(current)
+    return messages
+
+
+class Notifier:
+    """
+    Coalesces notifications into one message per user.
+
+    Events added while a batch is applied are sent when it is committed, or
+    notify_coalesce_seconds after the first pending event when that is set,
+    so a reshuffled community costs one message per subscriber instead of
+    one per tweet. Users with a digest interval get their events in the
+    next digest instead, together with the current stats of their tweets.
+    Digest events are kept in memory until then, and sent as a normal
+    message if the user turns the digest off first.
+    """
+
+    def __init__(self, db: DatabaseHandler):
+        self.db = db
+        self._pending: Dict[int, List[str]] = defaultdict(list)
+        self._digest: Dict[int, List[str]] = defaultdict(list)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, tweet: Tweet, title: str) -> int:
+        """Queue a notification for every subscriber, returns how many."""
+        block = format_tweet_message(title, tweet)
+        for subscription in tweet.subscriptions:
+            self._pending[subscription.user_id].append(block)
+        return len(tweet.subscriptions)
+
+    def add_block(self, user_id: int, block: str) -> None:
+        """Queue a preformatted notification for one user."""
+        self._pending[user_id].append(block)
+
+    async def commit(self) -> int:
+        """Send or schedule the pending events, returns messages sent now."""
+        if not self._pending:
+            return 0
+        window = app_config["notify_coalesce_seconds"]
+        if window <= 0:
+            return await self.flush()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(window))
+        return 0
+
+    async def _flush_later(self, window: float) -> None:
+        await asyncio.sleep(window)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Notification flush failed: {e}")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            if not pending:
+                return 0
+            digest_users = await self.db.get_digest_user_ids()
+            sent = 0
+            for user_id, blocks in pending.items():
+                if user_id in digest_users:
+                    self._digest[user_id].extend(blocks)
+                else:
+                    sent += await self._send(user_id, blocks)
+            return sent
+
+    async def send_digests(self, tweets: List[Tweet], result: FetchResult) -> int:
+        """Send the digests that are due, with stats from the latest sweep."""
+        sent = await self._release_digests()
+        user_ids = await self.db.get_due_digest_user_ids()
+        if not user_ids:
+            return sent
+        tweets_by_user: Dict[int, List[Tweet]] = defaultdict(list)
+        for tweet in tweets:
+            for subscription in tweet.subscriptions:
+                tweets_by_user[subscription.user_id].append(tweet)
+
+        for user_id in user_ids:
+            blocks = []
+            events = self._digest.pop(user_id, [])
+            if events:
+                blocks.append(f"<b>События: {len(events)}</b>\n")
+                blocks.extend(events)
+            user_tweets = tweets_by_user.get(user_id, [])
+            if user_tweets:
+                blocks.append(f"<b>Статистика постов: {len(user_tweets)}</b>\n")
+                blocks.extend(
+                    f"{html.escape(tweet.tweet_url)}\n"
+                    f"{format_check_status(tweet, result)}"
+                    for tweet in user_tweets
+                )
+            if blocks:
+                sent += await self._send(user_id, ["📊 Дайджест\n", *blocks])
+        await self.db.mark_digest_sent(user_ids)
+        return sent
+
+    async def _release_digests(self) -> int:
+        """Send the buffered events of users who turned the digest off."""
+        if not self._digest:
+            return 0
+        digest_users = await self.db.get_digest_user_ids()
+        sent = 0
+        for user_id in [user for user in self._digest if user not in digest_users]:
+            sent += await self._send(user_id, self._digest.pop(user_id))
+        return sent
+
+    async def _send(self, user_id: int, blocks: List[str]) -> int:
+        sent = 0
+        for text in split_message(blocks):
+            try:
+                response = await send_message(str(user_id), text)
+                if not response.get("ok"):
+                    # One retry when Telegram asks to slow down
+                    retry_after = (response.get("parameters") or {}).get("retry_after")
+                    if retry_after is None or retry_after > MAX_RETRY_AFTER:
+                        raise RuntimeError(response.get("description", response))
+                    await asyncio.sleep(retry_after)
+                    response = await send_message(str(user_id), text)
+                    if not response.get("ok"):
+                        raise RuntimeError(response.get("description", response))
+                sent += 1
+            except Exception as e:
+                logger.warning(f"Failed to notify {user_id}: {e}")
+        return sent
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Events that were not sent yet, by user."""
+        return {
+            "pending": {str(user): blocks for user, blocks in self._pending.items()},
+            "digest": {str(user): blocks for user, blocks in self._digest.items()},
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        for key, queue in (("pending", self._pending), ("digest", self._digest)):
+            for user, blocks in data.get(key, {}).items():
+                queue[int(user)][:0] = blocks
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Dropped pending notifications on shutdown: {e}")
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.db.database_handler import (
+    BULK_BATCH_SIZE,
+    TWEETS_CHANNEL,
+    TWEETS_RELOAD,
+    DatabaseHandler,
+)
+from core.db.tables import Tweet
+from core.services.app_config import app_config
+
+
+class ActiveTweetIndex:
+    """
+    In-memory copy of get_all_active_tweets() for the sweep.
+
+    Loaded once and then kept current from the NOTIFY on TWEETS_CHANNEL
+    that every DatabaseHandler method changing tweets or subscriptions
+    sends: get() only reads the rows changed since the last call. Every
+    tweet_index_reconcile_seconds a checksum of the tables is compared with
+    the index and a mismatch, e.g. after a lost notification, reloads it.
+    While there is no LISTEN connection every get() reloads in full, so
+    callers that can live with the last loaded tweets use current().
+    get() calls are serialised, concurrent ones never load the index or
+    open a LISTEN connection twice.
+    """
+
+    def __init__(self, db: DatabaseHandler):
+        self.db = db
+        self._tweets: Dict[int, Tweet] = {}
+        # Tweet row ids notified since the last get()
+        self._changed: Set[int] = set()
+        self._stale = True
+        self._listen_conn: Optional[AsyncConnection] = None
+        self._reconciled_at = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+        # Exposed on /metrics
+        self.reloads_total = 0
+        self.mismatches_total = 0
+
+    def __len__(self) -> int:
+        return len(self._tweets)
+
+    async def get(self) -> List[Tweet]:
+        async with self._lock:
+            await self._ensure_listening()
+            if self._stale or self._listen_conn is None:
+                await self._reload()
+            elif len(self._changed) > BULK_BATCH_SIZE:
+                await self._reload()
+            else:
+                if self._changed:
+                    await self._refresh()
+                interval = app_config["tweet_index_reconcile_seconds"]
+                if time.monotonic() - self._reconciled_at >= interval:
+                    await self._reconcile()
+            return list(self._tweets.values())
+
+    async def current(self) -> List[Tweet]:
+        """The tweets as of the last get(), which only runs if none has yet."""
+        if not self._loaded:
+            return await self.get()
+        return list(self._tweets.values())
+
+    def checksum(self) -> Optional[str]:
+        """Same digest as DatabaseHandler.get_active_tweets_checksum()."""
+        rows = sorted(
+            (subscription.id, tweet.id, int(tweet.on_top))
+            for tweet in self._tweets.values()
+            for subscription in tweet.subscriptions
+        )
+        if not rows:
+            return None
+        text = ",".join(f"{a}:{b}:{c}" for a, b, c in rows)
+        return hashlib.md5(text.encode()).hexdigest()
+
+    async def _reload(self) -> None:
+        # Notifications arriving during the query are applied by the next get()
+        self._stale = False
+        self._changed = set()
+        try:
+            tweets = await self.db.get_all_active_tweets()
+        except Exception:
+            self._stale = True
+            raise
+        self._tweets = {tweet.id: tweet for tweet in tweets}
+        self._loaded = True
+        self._reconciled_at = time.monotonic()
+        self.reloads_total += 1
+
+    async def _refresh(self) -> None:
+        changed, self._changed = self._changed, set()
+        try:
+            tweets = await self.db.get_all_active_tweets(tweet_pks=list(changed))
+        except Exception:
+            self._changed |= changed
+            raise
+        for tweet_pk in changed:
+            self._tweets.pop(tweet_pk, None)
+        self._tweets.update((tweet.id, tweet) for tweet in tweets)
+
+    async def _reconcile(self) -> None:
+        stored = await self.db.get_active_tweets_checksum()
+        if self._changed:
+            # A change raced the checksum, compare again next time
+            return
+        if stored != self.checksum():
+            self.mismatches_total += 1
+            logger.warning("Active tweet index out of sync with the DB, reloading")
+            await self._reload()
+            return
+        self._reconciled_at = time.monotonic()
+
+    async def _listen(self) -> None:
+        try:
+            self._listen_conn = await self.db.engine.connect()
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.add_listener(TWEETS_CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning(f"LISTEN {TWEETS_CHANNEL} failed, reloading every tick: {e}")
+            await self._unlisten()
+            return
+        # Changes before the LISTEN went unnoticed
+        self._stale = True
+
+    async def _ensure_listening(self) -> None:
+        if self._listen_conn is not None:
+            raw = await self._listen_conn.get_raw_connection()
+            if not raw.driver_connection.is_closed():
+                return
+            await self._unlisten()
+        await self._listen()
+
+    async def _unlisten(self) -> None:
+        if self._listen_conn is None:
+            return
+        try:
+            raw = await self._listen_conn.get_raw_connection()
+            await raw.driver_connection.remove_listener(TWEETS_CHANNEL, self._on_notify)
+            await self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        if payload == TWEETS_RELOAD:
+            self._stale = True
+        else:
+            self._changed.update(int(tweet_pk) for tweet_pk in payload.split(","))
+
+    async def stop(self) -> None:
+        async with self._lock:
+            await self._unlisten()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+
+from core.db.tables import Tweet
+
+
+@dataclass(frozen=True)
+class TweetState:
+    """
+    Last known state of a tracked tweet.
+
+    on_top and rank are None for tweets that are not tracked in a community.
+    """
+
+    exists: bool
+    on_top: Optional[bool] = None
+    rank: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Transition:
+    previous: TweetState
+    current: TweetState
+
+    @property
+    def deleted(self) -> bool:
+        return self.previous.exists and not self.current.exists
+
+    @property
+    def entered_top(self) -> bool:
+        return (
+            self.current.exists
+            and bool(self.current.on_top)
+            and not self.previous.on_top
+        )
+
+    @property
+    def left_top(self) -> bool:
+        return (
+            self.current.exists
+            and self.current.on_top is False
+            and bool(self.previous.on_top)
+        )
+
+
+class TweetStateStore:
+    """
+    In-memory snapshot of tweet states keyed by Tweet.id.
+
+    Every tick is diffed against the snapshot so that only state transitions
+    produce notifications and log lines. When a path is given the snapshot
+    is persisted as JSON and hydrated again on startup.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._states: Dict[int, TweetState] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def previous(self, tweet: Tweet) -> TweetState:
+        """Return the known state of a tweet, falling back to its DB row."""
+        state = self._states.get(tweet.id)
+        if state is not None:
+            return state
+        return TweetState(
+            exists=tweet.is_active,
+            on_top=tweet.on_top if tweet.community_id else None,
+        )
+
+    def diff(self, tweet: Tweet, current: TweetState) -> Optional[Transition]:
+        previous = self.previous(tweet)
+        if previous == current:
+            return None
+        return Transition(previous=previous, current=current)
+
+    def commit(self, tweet: Tweet, state: TweetState) -> None:
+        if self._states.get(tweet.id) != state:
+            self._states[tweet.id] = state
+            self._dirty = True
+
+    def retain(self, tweet_ids: Iterable[int]) -> None:
+        """Drop states of tweets that are no longer tracked."""
+        keep = set(tweet_ids)
+        stale = [key for key in self._states if key not in keep]
+        for key in stale:
+            del self._states[key]
+        if stale:
+            self._dirty = True
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._states = {
+                int(key): TweetState(**value) for key, value in data.items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Failed to load tweet state snapshot {self.path}: {e}")
+            return
+        self._dirty = False
+        logger.info(f"Loaded {len(self._states)} tweet states from {self.path}")
+
+    def _write(self, data: Dict[str, dict]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    async def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        data = {str(key): asdict(state) for key, state in self._states.items()}
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            logger.warning(f"Failed to save tweet state snapshot {self.path}: {e}")
+            return
+        self._dirty = False
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from core.services.checker import Checker
+from core.services.community_crawler import CommunityCrawler
+
+SNAPSHOT_VERSION = 1
+
+
+def to_wall(monotonic: Optional[float]) -> Optional[float]:
+    if monotonic is None:
+        return None
+    return time.time() - (time.monotonic() - monotonic)
+
+
+def to_monotonic(wall: Optional[float]) -> Optional[float]:
+    if wall is None:
+        return None
+    return time.monotonic() - (time.time() - wall)
+
+
+class WarmState:
+    """
+    Checker state that would otherwise be lost on restart: the guest token,
+    notifications not sent yet, when the last sweep, crawl and history
+    write started, and the growth tracker (in a .npz file next to the JSON).
+
+    Tweet states have their own snapshot (TweetStateStore) and crawl
+    cursors are checkpointed in the DB, so together a restarted checker
+    neither repeats alerts nor starts with a burst of token and sweep
+    requests. Monotonic times are stored as wall clock times.
+
+    A snapshot is consumed by load: it is renamed to .loaded before being
+    applied, so a checker that crashes later does not restore, and resend,
+    the same notifications again.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    @property
+    def growth_path(self) -> str:
+        return f"{self.path}.npz"
+
+    def load(
+        self, checker: Checker, crawler: Optional[CommunityCrawler] = None
+    ) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.replace(self.path, f"{self.path}.loaded")
+            if data.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported version {data.get('version')}")
+            checker.engine.restore(data["engine"])
+            checker.notifier.restore(data["notifier"])
+            checker.last_tick_started = to_monotonic(data["last_tick_started"])
+            checker.history_recorded_at = to_monotonic(data["history_recorded"])
+            if crawler is not None:
+                crawler.last_crawl_started = to_monotonic(data["last_crawl_started"])
+            if os.path.exists(self.growth_path):
+                checker.growth.load(self.growth_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to load warm state {self.path}: {e}")
+            return
+        logger.info(
+            f"Warm state loaded from {self.path}, saved "
+            f"{time.time() - data['saved_at']:.0f}s ago"
+        )
+
+    def _write(self, data: Dict[str, Any], checker: Checker) -> None:
+        checker.growth.save(f"{self.growth_path}.tmp")
+        os.replace(f"{self.growth_path}.tmp", self.growth_path)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    async def save(
+        self, checker: Checker, crawler: Optional[CommunityCrawler] = None
+    ) -> None:
+        """Call after the scheduler and checker have stopped."""
+        if not self.path:
+            return
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "engine": checker.engine.snapshot(),
+            "notifier": checker.notifier.snapshot(),
+            "last_tick_started": to_wall(checker.last_tick_started),
+            "history_recorded": to_wall(checker.history_recorded_at),
+            "last_crawl_started": to_wall(
+                crawler.last_crawl_started if crawler is not None else None
+            ),
+        }
+        try:
+            await asyncio.to_thread(self._write, data, checker)
+        except OSError as e:
+            logger.warning(f"Failed to save warm state {self.path}: {e}")
+            return
+        logger.info(f"Warm state saved to {self.path}")
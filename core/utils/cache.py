@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from core.utils.logs import EventLogger
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Sampled by the "cache_error" rate of core.utils.logs
+cache_error_log = EventLogger("cache_error")
+# How often a process waiting for another node's load polls for the result
+LOCK_POLL_INTERVAL = 0.05
+# Keys per MGET
+GET_MANY_BATCH = 1000
+
+
+class SingleFlight(Generic[K, V]):
+    """Coalesces concurrent calls for the same key into one."""
+
+    def __init__(self):
+        self._pending: Dict[K, asyncio.Future] = {}
+
+    async def do(self, key: K, call: Callable[[], Awaitable[V]]) -> V:
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting, mark the exception as retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._pending.pop(key, None)
+
+
+class TTLCache(Generic[K, V]):
+    """
+    In-process cache with per-entry expiry.
+
+    get_or_load coalesces concurrent misses for the same key into a single
+    loader call, so a burst of commands from one user hits the DB once.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[K, Tuple[float, V]] = {}
+        self._flight: SingleFlight[K, Optional[V]] = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        if len(self._data) >= self.maxsize and key not in self._data:
+            self._evict()
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(
+        self,
+        key: K,
+        loader: Callable[[], Awaitable[Optional[V]]],
+        ttl: Optional[float] = None,
+    ) -> Optional[V]:
+        """Return a cached value or load it once; None results are not cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        async def load() -> Optional[V]:
+            value = await loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            return value
+
+        return await self._flight.do(key, load)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key for key, (expires_at, _) in self._data.items() if expires_at < now
+        ]
+        for key in expired:
+            del self._data[key]
+        if len(self._data) >= self.maxsize:
+            # Dicts keep insertion order, drop the oldest entry
+            del self._data[next(iter(self._data))]
+
+
+class Cache(ABC):
+    """
+    Async cache of fetch results that checker nodes may share.
+
+    Values are JSON-compatible and None stands for a miss, so it is never
+    stored. get_or_load runs the loader once for concurrent misses of a
+    key, across nodes when the backend is shared.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]: ...
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """The keys that are cached, with their values."""
+        values = [await self.get(key) for key in keys]
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def acquire(self, key: str, ttl: float) -> bool:
+        """Take a lock that expires after ttl, False if it is held already."""
+
+    @abstractmethod
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Optional[Any]]], ttl: float
+    ) -> Optional[Any]: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCache(Cache):
+    """A Cache local to the process, for single-node deployments."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self._entries: TTLCache[str, Any] = TTLCache(ttl=0, maxsize=maxsize)
+        self._locks: TTLCache[str, bool] = TTLCache(ttl=0, maxsize=maxsize)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self._entries.invalidate(key)
+
+    async def acquire(self, key: str, ttl: float) -> bool:
+        if self._locks.get(key):
+            return False
+        self._locks.set(key, True, ttl)
+        return True
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Optional[Any]]], ttl: float
+    ) -> Optional[Any]:
+        return await self._entries.get_or_load(key, loader, ttl)
+
+
+def import_redis():
+    try:
+        import redis.asyncio
+    except ImportError as e:
+        raise RuntimeError("A redis:// CACHE_URL needs redis: pip install redis") from e
+    return redis
+
+
+class RedisCache(Cache):
+    """
+    A Cache in Redis (or anything speaking its protocol) shared by nodes.
+
+    Values are stored as JSON under prefix with a PX expiry. A miss takes a
+    SET NX lock next to the key while loading; other nodes poll for the
+    value until the lock is gone or lock_timeout has passed, and then load
+    it themselves. Redis errors are logged and treated as misses, so an
+    outage costs extra requests to X rather than failed sweeps.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "",
+        lock_timeout: float = 30,
+        max_connections: int = 50,
+        client: Any = None,
+    ):
+        redis = import_redis()
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self._errors = (redis.RedisError, OSError)
+        if client is None:
+            pool = redis.asyncio.BlockingConnectionPool.from_url(
+                url, max_connections=max_connections
+            )
+            client = redis.asyncio.Redis(connection_pool=pool)
+        self._redis = client
+        self._flight: SingleFlight[str, Optional[Any]] = SingleFlight()
+        # Lock values tell this process's locks apart from other nodes'
+        self._owner = uuid.uuid4().hex
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self._redis.get(self.prefix + key)
+        except self._errors as e:
+            cache_error_log.warning(
+                "Cache get of {key} failed: {error}", key=key, error=e
+            )
+            return None
+        return None if raw is None else json.loads(raw)
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for start in range(0, len(keys), GET_MANY_BATCH):
+            batch = keys[start : start + GET_MANY_BATCH]
+            try:
+                raws = await self._redis.mget([self.prefix + key for key in batch])
+            except self._errors as e:
+                cache_error_log.warning(
+                    "Cache get of {keys} keys failed: {error}", keys=len(batch), error=e
+                )
+                continue
+            values.update(
+                (key, json.loads(raw))
+                for key, raw in zip(batch, raws)
+                if raw is not None
+            )
+        return values
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            await self._redis.set(
+                self.prefix + key,
+                json.dumps(value, separators=(",", ":")),
+                px=max(1, int(ttl * 1000)),
+            )
+        except self._errors as e:
+            cache_error_log.warning(
+                "Cache set of {key} failed: {error}", key=key, error=e
+            )
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._redis.delete(self.prefix + key)
+        except self._errors as e:
+            cache_error_log.warning(
+                "Cache delete of {key} failed: {error}", key=key, error=e
+            )
+
+    async def acquire(self, key: str, ttl: float) -> bool:
+        try:
+            acquired = await self._redis.set(
+                f"{self.prefix}lock:{key}",
+                self._owner,
+                nx=True,
+                px=max(1, int(ttl * 1000)),
+            )
+        except self._errors as e:
+            cache_error_log.warning(
+                "Cache lock of {key} failed: {error}", key=key, error=e
+            )
+            # Without Redis every node works on its own
+            return True
+        return bool(acquired)
+
+    async def _release(self, key: str) -> None:
+        lock = f"{self.prefix}lock:{key}"
+        try:
+            # A lock that expired may belong to another node by now
+            if await self._redis.get(lock) in (self._owner, self._owner.encode()):
+                await self._redis.delete(lock)
+        except self._errors as e:
+            cache_error_log.warning(
+                "Cache unlock of {key} failed: {error}", key=key, error=e
+            )
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Optional[Any]]], ttl: float
+    ) -> Optional[Any]:
+        value = await self.get(key)
+        if value is not None:
+            return value
+        return await self._flight.do(key, lambda: self._load(key, loader, ttl))
+
+    async def _load(
+        self, key: str, loader: Callable[[], Awaitable[Optional[Any]]], ttl: float
+    ) -> Optional[Any]:
+        deadline = time.monotonic() + self.lock_timeout
+        while not await self.acquire(key, self.lock_timeout):
+            # Another node is loading the key
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await self.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                break
+        try:
+            value = await loader()
+            if value is not None:
+                await self.set(key, value, ttl)
+            return value
+        finally:
+            await self._release(key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_cache(url: Optional[str], prefix: str = "") -> Cache:
+    """MemoryCache without a URL, RedisCache for redis://, rediss:// and unix://."""
+    if not url or url == "memory":
+        return MemoryCache()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, prefix)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
@@ -0,0 +1,288 @@
+"""
+Record/replay layer for the HTTP calls to X and Telegram.
+
+With CASSETTE_MODE=record every response is captured into a single
+compressed archive; with CASSETTE_MODE=replay the same calls are answered
+from the memory-mapped archive without touching the network, e.g.
+
+    CASSETTE_MODE=replay CASSETTE_PATH=tick.cas python -m checker
+
+Archive layout: zlib-compressed records, then a zlib-compressed JSON index
+{key: [[offset, length], ...]}, the index offset and a trailing magic.
+
+    python -m core.utils.cassette info tick.cas
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from curl_cffi.requests import AsyncSession
+from curl_cffi.requests.exceptions import HTTPError
+from loguru import logger
+
+from config import (
+    CASSETTE_CONCURRENCY,
+    CASSETTE_MODE,
+    CASSETTE_PATH,
+    CASSETTE_SPEED,
+)
+
+MAGIC = b"XCASSET1"
+# status code and recorded latency in front of every response body
+RECORD_HEADER = struct.Struct("<Hd")
+FOOTER = struct.Struct("<Q")
+# The bot token is part of Telegram URLs and must not end up in keys
+BOT_TOKEN_RE = re.compile(r"/bot[^/]+/")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+@dataclass
+class Recorded:
+    status_code: int
+    content: bytes
+    elapsed: float = 0.0
+
+
+def request_key(method: str, url: str, params: Optional[Dict[str, Any]]) -> str:
+    """Requests are matched by method, URL and query, never by headers."""
+    url = BOT_TOKEN_RE.sub("/bot<token>/", url)
+    query = json.dumps(params or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(f"{method} {url} {query}".encode()).hexdigest()
+
+
+class Cassette:
+    """
+    One archive in record or replay mode.
+
+    Replay hands out the recordings of a key in order and starts over after
+    the last one, so a few recorded ticks can drive any number of replayed
+    ones. speed scales the recorded latency (0 answers at once) and
+    concurrency bounds the number of requests served at a time.
+    """
+
+    def __init__(self, path: str, mode: str, speed: float = 0.0, concurrency: int = 0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._limit = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        self._index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def open(self) -> "Cassette":
+        if self.recording:
+            self._file = open(f"{self.path}.tmp", "wb")
+            self._file.write(MAGIC)
+        else:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_index()
+        return self
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        if self.recording:
+            index_offset = self._file.tell()
+            self._file.write(zlib.compress(json.dumps(self._index).encode()))
+            self._file.write(FOOTER.pack(index_offset) + MAGIC)
+            self._file.close()
+            os.replace(f"{self.path}.tmp", self.path)
+            logger.info(f"Cassette {self.path} saved with {len(self)} responses")
+        else:
+            self._map.close()
+            self._file.close()
+        self._file = self._map = None
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def _read_index(self) -> None:
+        tail = FOOTER.size + len(MAGIC)
+        if self._map[: len(MAGIC)] != MAGIC or self._map[-len(MAGIC) :] != MAGIC:
+            raise ValueError(f"{self.path} is not a cassette")
+        (index_offset,) = FOOTER.unpack(self._map[-tail : -len(MAGIC)])
+        index = json.loads(zlib.decompress(self._map[index_offset:-tail]))
+        self._index = defaultdict(
+            list,
+            {key: [tuple(entry) for entry in value] for key, value in index.items()},
+        )
+
+    def _append(self, key: str, recorded: Recorded) -> None:
+        data = zlib.compress(
+            RECORD_HEADER.pack(recorded.status_code, recorded.elapsed)
+            + recorded.content
+        )
+        self._index[key].append((self._file.tell(), len(data)))
+        self._file.write(data)
+
+    def _load(self, key: str) -> Recorded:
+        entries = self._index.get(key)
+        if not entries:
+            raise CassetteMissError(f"No recorded response for {key}")
+        offset, length = entries[self._next[key] % len(entries)]
+        self._next[key] += 1
+        data = zlib.decompress(self._map[offset : offset + length])
+        status_code, elapsed = RECORD_HEADER.unpack_from(data)
+        return Recorded(status_code, data[RECORD_HEADER.size :], elapsed)
+
+    async def fetch(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        send: Callable[[], Awaitable[Recorded]],
+    ) -> Recorded:
+        """Record the response of send() or replay it without calling send."""
+        key = request_key(method, url, params)
+        if self.recording:
+            started = time.monotonic()
+            recorded = await send()
+            recorded.elapsed = time.monotonic() - started
+            self._append(key, recorded)
+            return recorded
+
+        recorded = self._load(key)
+        if self._limit is None:
+            return await self._delay(recorded)
+        async with self._limit:
+            return await self._delay(recorded)
+
+    async def _delay(self, recorded: Recorded) -> Recorded:
+        if self.speed > 0:
+            await asyncio.sleep(recorded.elapsed / self.speed)
+        return recorded
+
+
+class CassetteResponse:
+    """The part of the curl_cffi Response API used by the X clients."""
+
+    def __init__(self, recorded: Recorded):
+        self.status_code = recorded.status_code
+        self.content = recorded.content
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise HTTPError(f"HTTP Error {self.status_code}", 0, self)
+
+
+class CassetteSession:
+    """
+    Stand-in for curl_cffi's AsyncSession. Records through a real session
+    or replays without one.
+    """
+
+    def __init__(self, cassette: Cassette, session: Optional[AsyncSession] = None):
+        self.cassette = cassette
+        self.session = session
+
+    async def request(
+        self, method: str, url: str, params: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> CassetteResponse:
+        async def send() -> Recorded:
+            response = await self.session.request(method, url, params=params, **kwargs)
+            return Recorded(response.status_code, response.content)
+
+        return CassetteResponse(await self.cassette.fetch(method, url, params, send))
+
+    async def get(self, url: str, **kwargs) -> CassetteResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> CassetteResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self) -> "CassetteSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+_active: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    return _active
+
+
+def install_cassette(cassette: Optional[Cassette]) -> None:
+    global _active
+    _active = cassette
+
+
+def install_from_config() -> Optional[Cassette]:
+    """Open and install the cassette configured by CASSETTE_MODE/CASSETTE_PATH."""
+    if not CASSETTE_MODE:
+        return None
+    cassette = Cassette(
+        CASSETTE_PATH, CASSETTE_MODE, CASSETTE_SPEED, CASSETTE_CONCURRENCY
+    ).open()
+    install_cassette(cassette)
+    logger.info(f"Cassette {CASSETTE_PATH} opened in {CASSETTE_MODE} mode")
+    return cassette
+
+
+def create_session(impersonate: str = "chrome"):
+    """curl_cffi session, routed through the installed cassette if any."""
+    if _active is None:
+        return AsyncSession(impersonate=impersonate)
+    if _active.recording:
+        return CassetteSession(_active, AsyncSession(impersonate=impersonate))
+    return CassetteSession(_active)
+
+
+def _info(path: str) -> None:
+    cassette = Cassette(path, "replay").open()
+    try:
+        size = os.path.getsize(path)
+        print(
+            f"{path}: {len(cassette._index)} requests, {len(cassette)} responses, "
+            f"{size / 1024:.1f} KiB"
+        )
+    finally:
+        cassette.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "info":
+        print("Usage: python -m core.utils.cassette info <path>")
+        sys.exit(1)
+    _info(sys.argv[2])
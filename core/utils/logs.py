@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import traceback
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE
+
+# Share of records kept per event for messages that repeat in steady state;
+# LOG_SAMPLE="event=rate,..." overrides them
+DEFAULT_SAMPLE_RATES: Dict[str, float] = {
+    "tweet_transition": 1.0,
+    "timeline_parse_error": 0.1,
+    "check_job_poll_failed": 0.1,
+    "health_check_failed": 0.1,
+    "cache_error": 0.01,
+}
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in (value or "").split(","):
+        event, _, rate = item.partition("=")
+        if event.strip() and rate.strip():
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class EventSampler:
+    """
+    Keeps one in every 1/rate records of an event.
+
+    Sampling is deterministic: keep(event) returns the sampling factor of a
+    kept record (1 when the event is not sampled) or 0 for a dropped one.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = rates
+        self._seen: Dict[str, int] = {}
+
+    def keep(self, event: str) -> int:
+        rate = self.rates.get(event, 1.0)
+        if rate >= 1:
+            return 1
+        if rate <= 0:
+            return 0
+        every = round(1 / rate)
+        seen = self._seen.get(event, 0)
+        self._seen[event] = seen + 1
+        return 0 if seen % every else every
+
+
+sampler = EventSampler(parse_sample_rates(LOG_SAMPLE))
+
+
+class EventLogger:
+    """
+    logger.bind(event=...) that is sampled before the message is formatted.
+
+    loguru formats the message with its arguments before any handler
+    filter runs, so sampling has to happen at the call site for dropped
+    records to cost next to nothing. Kept records carry the sampling factor
+    in extra["sampled"], so counts can be scaled back.
+    """
+
+    def __init__(self, event: str):
+        self.event = event
+        self._logger = logger.bind(event=event)
+
+    def _log(self, level: str, message: str, args, kwargs, exception=False):
+        every = sampler.keep(self.event)
+        if not every:
+            return
+        log = self._logger if every == 1 else self._logger.bind(sampled=every)
+        log.opt(depth=2, exception=exception).log(level, message, *args, **kwargs)
+
+    def debug(self, message: str, *args, **kwargs) -> None:
+        self._log("DEBUG", message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs) -> None:
+        self._log("INFO", message, args, kwargs)
+
+    def warning(self, message: str, *args, **kwargs) -> None:
+        self._log("WARNING", message, args, kwargs)
+
+    def error(self, message: str, *args, **kwargs) -> None:
+        self._log("ERROR", message, args, kwargs)
+
+    def exception(self, message: str, *args, **kwargs) -> None:
+        self._log("ERROR", message, args, kwargs, exception=True)
+
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | "
+    "{name}:{function}:{line} - {message}"
+)
+
+
+class QueueSink:
+    """
+    loguru sink that only queues the raw record; a daemon thread formats it
+    (as JSON with serialize=True) and writes it to the stream.
+
+    Registered with format="{message}", so loguru does no formatting of its
+    own. The one thing it always renders on the calling thread is the
+    traceback of an exception, which the sink reuses rather than redoes.
+    """
+
+    def __init__(self, stream=sys.stderr, serialize: bool = False):
+        self.stream = stream
+        self.serialize = serialize
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._worker, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __call__(self, message) -> None:
+        self._queue.put(message)
+
+    def stop(self) -> None:
+        """Write out what is queued and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _worker(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                self.stream.write(self.format(message) + "\n")
+                self.stream.flush()
+            except Exception:
+                traceback.print_exc(file=sys.__stderr__)
+
+    def format(self, message) -> str:
+        record = message.record
+        text = TEXT_FORMAT.format_map(record)
+        exception = record["exception"]
+        if exception is not None:
+            # "{message}\n{exception}", loguru appends the traceback
+            text += message[len(record["message"]) :].rstrip("\n")
+        if not self.serialize:
+            return text
+        return json.dumps(
+            {
+                "text": text,
+                "record": {
+                    "time": record["time"].isoformat(),
+                    "timestamp": record["time"].timestamp(),
+                    "elapsed": record["elapsed"].total_seconds(),
+                    "level": record["level"].name,
+                    "message": record["message"],
+                    "name": record["name"],
+                    "module": record["module"],
+                    "function": record["function"],
+                    "line": record["line"],
+                    "file": record["file"].path,
+                    "process": record["process"].id,
+                    "thread": record["thread"].id,
+                    "extra": record["extra"],
+                    "exception": exception
+                    and {
+                        "type": exception.type and exception.type.__name__,
+                        "value": exception.value and str(exception.value),
+                    },
+                },
+            },
+            default=str,
+            ensure_ascii=False,
+        )
+
+
+def setup_logging() -> None:
+    """
+    Replace loguru's default sink with a non-blocking one. The calling
+    thread only queues the raw record; formatting (as JSON with
+    LOG_FORMAT=json) and writing happen in a background thread.
+    """
+    logger.remove()
+    sink = QueueSink(sys.stderr, serialize=LOG_FORMAT == "json")
+    # The handler's own format is a no-op, the sink formats the record
+    logger.add(
+        sink, level=LOG_LEVEL, format="{message}", backtrace=False, diagnose=False
+    )
+    atexit.register(sink.stop)
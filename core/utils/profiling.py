@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import cProfile
+import json
+import os
+import shutil
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from config import PROFILE_DIR, PROFILE_KEEP, PROFILE_TRACEMALLOC, PROFILER
+from core.services.app_config import app_config
+
+# Frames kept per allocation while tracemalloc is enabled
+TRACEMALLOC_FRAMES = 25
+
+
+class TickProfiler:
+    """
+    Wall and CPU time per stage of every checker tick.
+
+    While tick_profile_threshold_seconds is above 0 each tick also runs
+    under cProfile (or yappi, which follows asyncio tasks), and ticks that
+    take at least that long leave the profile, the stage timings and an
+    optional tracemalloc snapshot in a directory under PROFILE_DIR. Only
+    the newest PROFILE_KEEP directories are kept.
+
+    CPU time is the event loop thread's, so it includes whatever else the
+    loop ran while a stage was waiting.
+    """
+
+    def __init__(
+        self,
+        directory: str = PROFILE_DIR,
+        keep: int = PROFILE_KEEP,
+        backend: str = PROFILER,
+        trace_memory: bool = PROFILE_TRACEMALLOC,
+    ):
+        self.directory = directory
+        self.keep = keep
+        self.backend = backend
+        self.trace_memory = trace_memory
+        self.last_duration = 0.0
+        self.last_stages: Dict[str, Dict[str, float]] = {}
+        self._stages: Dict[str, List[float]] = {}
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block; repeated stages of one tick are summed up."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            totals = self._stages.setdefault(name, [0.0, 0.0])
+            totals[0] += time.perf_counter() - wall
+            totals[1] += time.thread_time() - cpu
+
+    @contextlib.asynccontextmanager
+    async def tick(self) -> AsyncIterator[None]:
+        threshold = app_config["tick_profile_threshold_seconds"]
+        self._stages = {}
+        profile = self._start_profile() if threshold > 0 else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.last_duration = time.perf_counter() - wall
+            self._stages["total"] = [self.last_duration, time.thread_time() - cpu]
+            self._stop_profile(profile)
+            self.last_stages = {
+                name: {"wall": round(stage_wall, 4), "cpu": round(stage_cpu, 4)}
+                for name, (stage_wall, stage_cpu) in self._stages.items()
+            }
+            if 0 < threshold <= self.last_duration:
+                logger.warning(
+                    f"Slow tick: {self.last_duration:.2f}s, stages {self.last_stages}"
+                )
+                try:
+                    await self._dump(profile)
+                except Exception as e:
+                    logger.warning(f"Failed to write tick profile: {e}")
+
+    def _start_profile(self) -> Any:
+        try:
+            if self.backend == "yappi":
+                import yappi
+
+                yappi.set_clock_type("wall")
+                yappi.clear_stats()
+                yappi.start()
+                return yappi
+            profile = cProfile.Profile()
+            profile.enable()
+            return profile
+        except ImportError:
+            logger.warning("yappi is not installed, falling back to cProfile")
+            self.backend = "cprofile"
+            return self._start_profile()
+        except ValueError as e:
+            # Another profiler is already active on this thread
+            logger.warning(f"Tick profiling skipped: {e}")
+            return None
+
+    @staticmethod
+    def _stop_profile(profile: Any) -> None:
+        if profile is None:
+            return
+        if isinstance(profile, cProfile.Profile):
+            profile.disable()
+        else:
+            profile.stop()
+
+    async def _dump(self, profile: Any) -> None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{stamp}-{self.last_duration:.1f}s")
+        stages = dict(self.last_stages)
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        await asyncio.to_thread(self._write, path, stages, profile, snapshot)
+        logger.info(f"Tick profile written to {path}")
+
+    def _write(
+        self,
+        path: str,
+        stages: Dict[str, Dict[str, float]],
+        profile: Any,
+        snapshot: Optional[tracemalloc.Snapshot],
+    ) -> None:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "stages.json"), "w", encoding="utf-8") as f:
+            json.dump(stages, f, indent=2)
+        if isinstance(profile, cProfile.Profile):
+            profile.dump_stats(os.path.join(path, "tick.prof"))
+        elif profile is not None:
+            profile.get_func_stats().save(os.path.join(path, "tick.prof"), "pstat")
+        if snapshot is not None:
+            snapshot.dump(os.path.join(path, "tick.tracemalloc"))
+        self._rotate()
+
+    def _rotate(self) -> None:
+        # Directory names start with a timestamp, so they sort by age
+        runs = sorted(
+            entry.path for entry in os.scandir(self.directory) if entry.is_dir()
+        )
+        for old in runs[: max(len(runs) - self.keep, 0)]:
+            shutil.rmtree(old, ignore_errors=True)
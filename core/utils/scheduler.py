@@ -1,68 +1,150 @@
-from fastscheduler import FastScheduler
+import asyncio
+import contextlib
+import time
+from typing import List, Optional
+
 from loguru import logger
 
-from config import DB_URL
-from core.db.database_handler import DatabaseHandler
-from core.services.stats import get_stats_service
-from core.utils.telegram import send_message
-
-scheduler = FastScheduler(quiet=True)
-
-
-@scheduler.every(1).minutes.no_catch_up()
-async def check_tweets():
-    db = DatabaseHandler(DB_URL)
-    tweets = await db.get_all_active_tweets()
-    tweets_data, tweets_on_top = await get_stats_service(tweets)
-    for tweet in tweets:
-        if tweets_data.get(tweet.tweet_id) is None:
-            await send_message(
-                str(tweet.user_id),
-                (
-                    f"❌⚠️ ПОСТ УДАЛЁН ⚠️❌\n"
-                    f"Tweet Url: {tweet.tweet_url}\n"
-                    f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
-                    f"Community URL: https://x.com/i/communities/{tweet.community_id}\n"
-                    if tweet.community_id
-                    else f"❌⚠️ ПОСТ УДАЛЁН ⚠️❌\n"
-                    f"Tweet Url: {tweet.tweet_url}\n"
-                    f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
-                ),
+from config import SHUTDOWN_TIMEOUT
+from core.services.app_config import app_config
+from core.services.checker import Checker
+from core.services.community_crawler import CommunityCrawler
+
+# How often the wait between ticks re-reads check_interval_seconds,
+# so a changed interval applies without a restart
+SCHEDULER_RESOLUTION = 5
+
+
+async def wait_interval(
+    started: float, interval_name: str, stopping: asyncio.Event
+) -> None:
+    """
+    Sleep until the app_config interval has passed since started, returns
+    early once stopping is set.
+    """
+    while not stopping.is_set():
+        elapsed = time.monotonic() - started
+        remaining = app_config[interval_name] - elapsed
+        if remaining <= 0:
+            break
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                stopping.wait(), min(remaining, SCHEDULER_RESOLUTION)
             )
-            await db.set_as_inactive(tweet.tweet_id)
-        if tweets_on_top.get(tweet.tweet_id) is None:
+
+
+async def run_checker(checker: Checker, stopping: asyncio.Event) -> None:
+    """
+    Run a sweep every check_interval_seconds, counted from its start, until
+    stopping is set. A checker restored from a warm state keeps the schedule
+    of the previous process instead of sweeping right away.
+    """
+    if checker.last_tick_started is not None:
+        await wait_interval(
+            checker.last_tick_started, "check_interval_seconds", stopping
+        )
+    while not stopping.is_set():
+        started = time.monotonic()
+        try:
+            await checker.check_tweets()
+        except Exception as e:
+            logger.exception(f"check_tweets failed: {e}")
+        await wait_interval(started, "check_interval_seconds", stopping)
+
+
+async def run_crawler(crawler: CommunityCrawler, stopping: asyncio.Event) -> None:
+    """
+    Crawl tracked communities every crawl_interval_seconds while it is > 0.
+    Checker nodes sharing a cache take turns: each interval of the wall
+    clock is crawled by the first node to lock it.
+    """
+    if crawler.last_crawl_started is not None:
+        await wait_interval(
+            crawler.last_crawl_started, "crawl_interval_seconds", stopping
+        )
+    while not stopping.is_set():
+        if app_config["crawl_interval_seconds"] <= 0:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stopping.wait(), SCHEDULER_RESOLUTION)
             continue
-        elif tweets_on_top[tweet.tweet_id]:
-            if not tweet.on_top:
-                await send_message(
-                    str(tweet.user_id),
-                    (
-                        f"✅⚠️ ПОСТ В ТОПЕ ⚠️✅\n"
-                        f"Tweet Url: {tweet.tweet_url}\n"
-                        f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
-                        f"Community URL: https://x.com/i/communities/{tweet.community_id}\n"
-                        if tweet.community_id
-                        else ""
-                    ),
-                )
-            logger.info(
-                f"Tweet {tweet.tweet_id} on Top: {tweets_on_top[tweet.tweet_id]}"
-            )
-            await db.set_on_top_status(tweet.tweet_id, tweet.community_id, True)
-        elif not tweets_on_top[tweet.tweet_id]:
-            if tweet.on_top:
-                await send_message(
-                    str(tweet.user_id),
-                    (
-                        f"❌⚠️ ПОСТ НЕ В ТОПЕ ⚠️❌\n"
-                        f"Tweet Url: {tweet.tweet_url}\n"
-                        f"Tweet ID: <code>{tweet.tweet_id}</code>\n"
-                        f"Community URL: https://x.com/i/communities/{tweet.community_id}\n"
-                        if tweet.community_id
-                        else ""
-                    ),
-                )
-            logger.info(
-                f"Tweet {tweet.tweet_id} on Top: {tweets_on_top[tweet.tweet_id]}"
+        started = time.monotonic()
+        interval = app_config["crawl_interval_seconds"]
+        slot = int(time.time() // interval)
+        try:
+            if await crawler.engine.cache.acquire(f"crawl:{slot}", interval):
+                await crawler.crawl_all()
+        except Exception as e:
+            logger.exception(f"crawl_all failed: {e}")
+        await wait_interval(started, "crawl_interval_seconds", stopping)
+
+
+async def run_top_poller(checker: Checker, stopping: asyncio.Event) -> None:
+    """
+    Poll community tops that are due between sweeps, e.g. busy communities
+    polled more often than check_interval_seconds.
+    """
+    while not stopping.is_set():
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stopping.wait(), SCHEDULER_RESOLUTION)
+        if stopping.is_set():
+            break
+        try:
+            await checker.poll_communities()
+        except Exception as e:
+            logger.warning(f"Community top poll failed: {e}")
+
+
+class Scheduler:
+    """
+    Runs the checker, the community top poller and the community crawler
+    as tasks in the event loop, so they and on-demand checks share one warm
+    fetch engine.
+
+    stop() lets a running sweep finish within a timeout so its notifications
+    and state are not lost. The poller and the crawler are cancelled right
+    away; the crawler resumes from the checkpoint written after every page.
+    """
+
+    def __init__(self):
+        self._checker_task: Optional[asyncio.Task] = None
+        self._poller_task: Optional[asyncio.Task] = None
+        self._crawler_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def start(
+        self, checker: Checker, crawler: Optional[CommunityCrawler] = None
+    ) -> None:
+        if self._checker_task is not None and not self._checker_task.done():
+            return
+        self._stopping = asyncio.Event()
+        self._checker_task = asyncio.create_task(run_checker(checker, self._stopping))
+        self._poller_task = asyncio.create_task(run_top_poller(checker, self._stopping))
+        if crawler is not None:
+            self._crawler_task = asyncio.create_task(
+                run_crawler(crawler, self._stopping)
             )
-            await db.set_on_top_status(tweet.tweet_id, tweet.community_id, False)
+
+    async def stop(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        self._stopping.set()
+        checker_task, self._checker_task = self._checker_task, None
+        poller_task, self._poller_task = self._poller_task, None
+        crawler_task, self._crawler_task = self._crawler_task, None
+        tasks: List[asyncio.Task] = []
+        for task in (poller_task, crawler_task):
+            if task is not None:
+                task.cancel()
+                tasks.append(task)
+        if checker_task is not None:
+            _, unfinished = await asyncio.wait([checker_task], timeout=timeout)
+            if unfinished:
+                logger.warning(f"Sweep did not finish within {timeout}s, cancelled")
+                checker_task.cancel()
+            tasks.append(checker_task)
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+scheduler = Scheduler()
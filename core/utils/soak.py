@@ -0,0 +1,600 @@
+"""
+Soak test of the real main() stack over days of simulated ticks.
+
+The runner creates a throwaway database on the server of DB_URL, seeds it
+with users and tweets, serves fake X and Telegram APIs on 127.0.0.1 (see
+core/utils/soak_servers.py) and starts main.main() in webhook mode in a
+worker process. The worker's event loop runs on a virtual clock: while no
+sweep, top poll, crawl or on-demand check is running and no I/O arrives
+within --settle seconds, the clock jumps to the next timer, so the
+1-minute schedule runs as fast as the sweeps themselves, which take real
+time. Startup and shutdown run on a frozen clock.
+
+After every tick the worker reports its RSS, open file descriptors and
+tick duration, the runner adds the Postgres connections to the database.
+The run fails when, from the first to the last window of ticks after
+warm-up, RSS grows, descriptors or connections leak or the tick latency
+drifts beyond the limits, or when ticks fail or fall behind the schedule:
+
+    python -m core.utils.soak --tweets 20000 --days 2
+    python -m core.utils.soak --days 7 --max-rss-growth 32 --set fetch_concurrency=20
+
+In the worker time.time() and time.monotonic() follow the virtual clock;
+Postgres now() and log timestamps stay on the wall clock.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import selectors
+import shutil
+import signal
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DAY = 24 * 3600
+MIB = 1024 * 1024
+SOAK_BOT_TOKEN = "123456:soak"
+# Telegram ids of the seeded users start here
+SOAK_USER_BASE = 10_000_000
+# Seeded tweets were posted within this many seconds before the run
+SEED_AGE_SECONDS = 3 * DAY
+# app_config of the soak database, --set overrides and extends it
+SOAK_CONFIG: Dict[str, Any] = {
+    "crawl_interval_seconds": 900,
+    "stats_history_interval_seconds": 3600,
+    "telegram_messages_per_second": 1000.0,
+}
+# Ticks per comparison window: a tenth of the run, at least this many
+MIN_WINDOW = 5
+# Tick latency differences below this are noise, whatever the ratio
+LATENCY_NOISE_SECONDS = 0.05
+
+
+class VirtualClock:
+    """
+    time.monotonic() and time.time() plus an offset that only grows. The
+    loop of new_event_loop() moves it to the next timer at least min_jump
+    seconds away when nothing tracked() is running and no I/O arrived
+    within settle seconds. Shorter timers, like the 0.1s safety tick of
+    every curl_cffi session, just fire late.
+    """
+
+    def __init__(self, settle: float = 0.01, min_jump: float = 0.5):
+        self.settle = settle
+        self.min_jump = min_jump
+        self.offset = 0.0
+        self.busy = 0
+        self._monotonic = time.monotonic
+        self._time = time.time
+        self._started = self._monotonic()
+
+    def install(self) -> None:
+        # The event loop reads time.monotonic() too
+        time.monotonic = lambda: self._monotonic() + self.offset
+        time.time = lambda: self._time() + self.offset
+
+    def elapsed(self) -> float:
+        """Virtual seconds since the clock was created."""
+        return self._monotonic() + self.offset - self._started
+
+    def new_event_loop(self) -> asyncio.AbstractEventLoop:
+        selector = VirtualSelector(self, selectors.DefaultSelector())
+        selector.loop = asyncio.SelectorEventLoop(selector)
+        return selector.loop
+
+    def tracked(self, method: Callable) -> Callable:
+        """Wrap a coroutine method; the clock stands still while it runs."""
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            self.busy += 1
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.busy -= 1
+
+        return wrapper
+
+
+class VirtualSelector(selectors.BaseSelector):
+    """Selector that lets the clock skip an idle wait for the next timer."""
+
+    def __init__(self, clock: VirtualClock, selector: selectors.BaseSelector):
+        self.clock = clock
+        self._selector = selector
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_key(self, fileobj):
+        return self._selector.get_key(fileobj)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self) -> None:
+        self._selector.close()
+
+    def _next_deadline(self, after: float) -> Optional[float]:
+        # The loop's own timer heap, nothing public lists the pending timers
+        return min(
+            (
+                timer.when()
+                for timer in self.loop._scheduled
+                if not timer.cancelled() and timer.when() >= after
+            ),
+            default=None,
+        )
+
+    def select(self, timeout=None):
+        clock = self.clock
+        # timeout is 0 while callbacks are ready to run
+        if timeout is None or timeout <= 0 or clock.busy:
+            return self._selector.select(timeout)
+        events = self._selector.select(min(timeout, clock.settle))
+        if not events:
+            now = self.loop.time()
+            deadline = self._next_deadline(now + clock.min_jump)
+            if deadline is not None:
+                clock.offset += deadline - now
+        return events
+
+
+def process_sample() -> Dict[str, int]:
+    """RSS in bytes and open file descriptors of this process (Linux)."""
+    with open("/proc/self/status", encoding="ascii") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return {"rss": rss * 1024, "fds": len(os.listdir("/proc/self/fd"))}
+
+
+async def run_worker(args: argparse.Namespace, clock: VirtualClock) -> None:
+    # Imported after the clock is installed and DB_URL is set
+    import bot
+    import main as app
+    from core.services.app_config import ConfigService
+    from core.services.checker import Checker
+    from core.services.community_crawler import CommunityCrawler
+
+    check_tweets = Checker.check_tweets
+    stopping = False
+
+    async def reported_check_tweets(checker: Checker) -> None:
+        nonlocal stopping
+        try:
+            await check_tweets(checker)
+        finally:
+            sample = {
+                "clock": clock.elapsed(),
+                "tick": checker.ticks_total,
+                "failures": checker.tick_failures_total,
+                "duration": checker.last_tick_duration,
+                "tracked": checker.tracked_tweets,
+                **process_sample(),
+            }
+            report.write(json.dumps(sample) + "\n")
+            if not stopping and clock.elapsed() >= args.days * DAY:
+                stopping = True
+                # Shuts main() down the way a deployment would
+                os.kill(os.getpid(), signal.SIGTERM)
+
+    wait_for_shutdown = bot.wait_for_shutdown
+
+    async def serve_until_shutdown() -> None:
+        # Startup and shutdown run on a frozen clock, so their connects and
+        # requests never see a timeout fire early
+        clock.busy -= 1
+        try:
+            await wait_for_shutdown()
+        finally:
+            clock.busy += 1
+
+    clock.busy += 1
+    bot.wait_for_shutdown = serve_until_shutdown
+    Checker.check_tweets = clock.tracked(reported_check_tweets)
+    Checker.check_now = clock.tracked(Checker.check_now)
+    Checker.poll_communities = clock.tracked(Checker.poll_communities)
+    CommunityCrawler.crawl_all = clock.tracked(CommunityCrawler.crawl_all)
+    ConfigService.load = clock.tracked(ConfigService.load)
+    with open(args.report, "a", encoding="utf-8", buffering=1) as report:
+        await app.main()
+
+
+def worker_main(args: argparse.Namespace) -> None:
+    import config
+
+    config.DB_URL = args.db_url
+    clock = VirtualClock(args.settle)
+    clock.install()
+    with asyncio.Runner(loop_factory=clock.new_event_loop) as runner:
+        runner.run(run_worker(args, clock))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def config_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    return "str"
+
+
+def parse_settings(items: List[str]) -> Dict[str, Any]:
+    """key=value pairs typed like the app_config defaults."""
+    from core.services.app_config import DEFAULTS
+
+    settings = dict(SOAK_CONFIG)
+    for item in items:
+        key, _, value = item.partition("=")
+        if key not in DEFAULTS:
+            raise SystemExit(f"Unknown app_config setting: {key}")
+        kind = type(DEFAULTS[key])
+        if kind is bool:
+            settings[key] = value.lower() in ("true", "1", "yes", "y")
+        else:
+            settings[key] = kind(value)
+    return settings
+
+
+class Seeder:
+    """Creates users and tweets in the soak database and the fake X."""
+
+    def __init__(self, db, fake_x, args: argparse.Namespace):
+        self.db = db
+        self.fake_x = fake_x
+        self.args = args
+        self.random = random.Random(args.seed)
+        self._sequence = 0
+
+    def _tweet_id(self, posted_at: float) -> str:
+        from core.utils.tweet_links import SNOWFLAKE_EPOCH_MS
+
+        self._sequence += 1
+        ms = int(posted_at * 1000) - SNOWFLAKE_EPOCH_MS
+        return str(ms << 22 | self._sequence & 0x3FFFFF)
+
+    async def add_tweets(self, count: int, max_age: float) -> None:
+        by_user: Dict[int, List[Tuple[str, str, Optional[str]]]] = {}
+        now = time.time()
+        for _ in range(count):
+            tweet_id = self._tweet_id(now - self.random.uniform(0, max_age))
+            community_id = None
+            if self.random.random() < self.args.community_share:
+                community_id = str(1000 + self.random.randrange(self.args.communities))
+            user_id = SOAK_USER_BASE + self.random.randrange(self.args.users)
+            self.fake_x.add_tweet(tweet_id, community_id)
+            by_user.setdefault(user_id, []).append(
+                (f"https://x.com/i/status/{tweet_id}", tweet_id, community_id)
+            )
+        for user_id, links in by_user.items():
+            await self.db.add_tweets(user_id, links)
+
+    async def seed(self, settings: Dict[str, Any]) -> None:
+        for name, value in settings.items():
+            await self.db.set_config(name, str(value), config_type(value))
+        for index in range(self.args.users):
+            await self.db.create_or_get_user(
+                SOAK_USER_BASE + index, first_name=f"soak{index}"
+            )
+        await self.add_tweets(self.args.tweets, SEED_AGE_SECONDS)
+
+
+async def count_connections(admin, database: str) -> int:
+    from sqlalchemy import text
+
+    async with admin.connect() as conn:
+        result = await conn.execute(
+            text("SELECT count(*) FROM pg_stat_activity WHERE datname = :name"),
+            {"name": database},
+        )
+        return result.scalar_one()
+
+
+def _window(samples: List[Dict[str, Any]], key: str) -> Tuple[float, float]:
+    size = max(MIN_WINDOW, len(samples) // 10)
+    first = statistics.median(s[key] for s in samples[:size])
+    last = statistics.median(s[key] for s in samples[-size:])
+    return first, last
+
+
+def evaluate(
+    samples: List[Dict[str, Any]],
+    args: argparse.Namespace,
+    interval: float,
+    returncode: Optional[int],
+) -> List[Tuple[str, str, str, str, bool]]:
+    """(check, baseline, final, limit, passed) rows of the verdict."""
+    rows = []
+    steady = [s for s in samples if s["clock"] >= args.warmup_hours * 3600]
+    if len(steady) < 2 * MIN_WINDOW:
+        rows.append(
+            ("ticks after warm-up", "", str(len(steady)), f">={2 * MIN_WINDOW}", False)
+        )
+    else:
+        first, last = _window(steady, "rss")
+        rows.append(
+            (
+                "rss MiB",
+                f"{first / MIB:.1f}",
+                f"{last / MIB:.1f}",
+                f"+{args.max_rss_growth:g}",
+                last - first <= args.max_rss_growth * MIB,
+            )
+        )
+        for key, label, limit in (
+            ("fds", "open fds", args.max_fd_growth),
+            ("db_connections", "db connections", args.max_db_connection_growth),
+        ):
+            first, last = _window(steady, key)
+            rows.append(
+                (label, f"{first:g}", f"{last:g}", f"+{limit}", last - first <= limit)
+            )
+        first, last = _window(steady, "duration")
+        rows.append(
+            (
+                "tick seconds",
+                f"{first:.3f}",
+                f"{last:.3f}",
+                f"x{args.max_latency_drift:g}",
+                last <= first * args.max_latency_drift
+                or last - first <= LATENCY_NOISE_SECONDS,
+            )
+        )
+    failures = samples[-1]["failures"] if samples else 0
+    rows.append(("failed ticks", "", str(failures), "0", failures == 0))
+    expected = int(args.days * DAY / interval)
+    rows.append(
+        (
+            "ticks",
+            "",
+            str(len(samples)),
+            f">={int(expected * 0.9)}",
+            len(samples) >= expected * 0.9,
+        )
+    )
+    rows.append(("worker exit code", "", str(returncode), "0", returncode == 0))
+    return rows
+
+
+async def monitor(
+    proc: asyncio.subprocess.Process,
+    args: argparse.Namespace,
+    seeder: Seeder,
+    admin,
+    database: str,
+) -> List[Dict[str, Any]]:
+    """Collect the worker's tick reports until it exits."""
+    samples: List[Dict[str, Any]] = []
+    started = time.monotonic()
+    next_progress = 0.0
+    pending = ""
+    with open(args.report, "a+", encoding="utf-8") as report:
+        report.seek(0)
+        exited = False
+        while True:
+            line = report.readline()
+            if not line:
+                if exited:
+                    break
+                try:
+                    await asyncio.wait_for(proc.wait(), 0.5)
+                    # Read what was written before the exit
+                    exited = True
+                except asyncio.TimeoutError:
+                    if args.timeout and time.monotonic() - started > args.timeout:
+                        print(f"Timed out after {args.timeout:g}s, stopping the worker")
+                        proc.terminate()
+                continue
+            pending += line
+            if not pending.endswith("\n"):
+                continue
+            sample, pending = json.loads(pending), ""
+            sample["db_connections"] = await count_connections(admin, database)
+            samples.append(sample)
+            deleted = seeder.fake_x.take_deleted()
+            if deleted:
+                # Keep the tracked set at its size, as new links keep coming in
+                await seeder.add_tweets(len(deleted), 0)
+            if sample["clock"] >= next_progress:
+                next_progress += args.progress_hours * 3600
+                print(
+                    f"{sample['clock'] / 3600:7.1f}h tick {sample['tick']:>6} "
+                    f"{sample['duration']:6.2f}s rss {sample['rss'] / MIB:6.1f} MiB "
+                    f"fds {sample['fds']:>4} db {sample['db_connections']:>3} "
+                    f"tracked {sample['tracked']}",
+                    flush=True,
+                )
+    return samples
+
+
+async def run(args: argparse.Namespace) -> bool:
+    from sqlalchemy import make_url, text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from config import DB_URL
+    from core.db.database_handler import DatabaseHandler
+    from core.services.app_config import DEFAULTS
+    from core.utils.soak_servers import FakeTelegram, FakeX, serve
+
+    settings = parse_settings(args.set)
+    interval = settings.get(
+        "check_interval_seconds", DEFAULTS["check_interval_seconds"]
+    )
+    admin_url = make_url(args.db_url or DB_URL)
+    database = f"soak_{uuid.uuid4().hex[:8]}"
+    soak_url = admin_url.set(database=database).render_as_string(hide_password=False)
+    admin = create_async_engine(admin_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'CREATE DATABASE "{database}"'))
+
+    fake_x = FakeX(args.delete_rate, args.seed)
+    telegram = FakeTelegram()
+    runners = []
+    db = DatabaseHandler(soak_url)
+    workdir = tempfile.mkdtemp(prefix="soak_")
+    args.report = os.path.join(workdir, "report.jsonl")
+    try:
+        await db.init()
+        seeder = Seeder(db, fake_x, args)
+        started = time.monotonic()
+        await seeder.seed(settings)
+        print(
+            f"Seeded {args.tweets} tweets of {args.users} users into {database} "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        runner, x_port = await serve(fake_x.app())
+        runners.append(runner)
+        runner, telegram_port = await serve(telegram.app())
+        runners.append(runner)
+
+        web_port = free_port()
+        env = dict(
+            os.environ,
+            BOT_TOKEN=SOAK_BOT_TOKEN,
+            RUN_MODE="webhook",
+            WEB_HOST="127.0.0.1",
+            WEB_PORT=str(web_port),
+            WEBHOOK_BASE_URL=f"http://127.0.0.1:{web_port}",
+            X_API_URL=f"http://127.0.0.1:{x_port}",
+            TELEGRAM_API_URL=f"http://127.0.0.1:{telegram_port}",
+            STATE_SNAPSHOT_PATH=os.path.join(workdir, "state.json"),
+            WARM_STATE_PATH=os.path.join(workdir, "warm.json"),
+            LOG_LEVEL=args.log_level,
+            CASSETTE_MODE="",
+            CACHE_URL="",
+        )
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "core.utils.soak",
+            "--worker",
+            "--db-url",
+            soak_url,
+            "--report",
+            args.report,
+            "--days",
+            str(args.days),
+            "--settle",
+            str(args.settle),
+            cwd=ROOT_DIR,
+            env=env,
+        )
+        try:
+            samples = await monitor(proc, args, seeder, admin, database)
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+        await db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+        if not args.keep_db:
+            async with admin.connect() as conn:
+                await conn.execute(
+                    text(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+                )
+        await admin.dispose()
+
+    print(
+        f"{len(samples)} ticks, {fake_x.requests_total} X requests, "
+        f"{telegram.messages_total} Telegram messages, "
+        f"{len(fake_x.deleted)} tweets deleted and replaced"
+    )
+    rows = evaluate(samples, args, interval, proc.returncode)
+    print(f"{'check':<22}{'baseline':>12}{'final':>12}{'limit':>10}  result")
+    for check, baseline, final, limit, passed in rows:
+        result = "ok" if passed else "FAIL"
+        print(f"{check:<22}{baseline:>12}{final:>12}{limit:>10}  {result}")
+    return all(row[-1] for row in rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m core.utils.soak")
+    parser.add_argument("--days", type=float, default=1.0, help="Simulated days")
+    parser.add_argument("--tweets", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--communities", type=int, default=200)
+    parser.add_argument(
+        "--community-share",
+        type=float,
+        default=0.5,
+        help="Share of tweets tracked in a community",
+    )
+    parser.add_argument(
+        "--delete-rate",
+        type=float,
+        default=0.0002,
+        help="Chance a stats request finds the tweet deleted; deleted tweets are replaced",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="app_config setting of the soak database",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--db-url", help="Server to create the throwaway database on (default DB_URL)"
+    )
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--warmup-hours", type=float, default=1.0)
+    parser.add_argument("--max-rss-growth", type=float, default=64, help="MiB")
+    parser.add_argument("--max-fd-growth", type=int, default=20)
+    parser.add_argument("--max-db-connection-growth", type=int, default=2)
+    parser.add_argument(
+        "--max-latency-drift",
+        type=float,
+        default=1.5,
+        help="Allowed ratio of the last to the first median tick duration",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=0.01,
+        help="Real seconds without I/O before the idle clock jumps",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=0, help="Real seconds, 0 = no limit"
+    )
+    parser.add_argument("--progress-hours", type=float, default=1.0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--report", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Fake X and Telegram APIs for the soak test, see core/utils/soak.py.
+
+FakeX answers the guest token, tweet and ranked community timeline
+requests the X clients make, with stats that grow on every request, tops
+that rotate and tweets that get deleted at a configurable rate. FakeTelegram
+accepts every Bot API method and counts sent messages. Both are plain
+aiohttp apps served on 127.0.0.1.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+# Stats requests of a tweet between two moves of its community's top
+TOP_ROTATE_REQUESTS = 20
+
+
+class FakeX:
+    def __init__(self, delete_rate: float = 0.0, seed: int = 0):
+        self.delete_rate = delete_rate
+        self.random = random.Random(seed)
+        # tweet_id -> views, bookmarks, favorites, retweets, quotes, replies
+        self.stats: Dict[str, List[int]] = {}
+        self.communities: Dict[str, List[str]] = defaultdict(list)
+        self._rotation: Dict[str, int] = defaultdict(int)
+        self.deleted: Set[str] = set()
+        # Deleted since the last take_deleted(), for the runner to replace
+        self._new_deleted: List[str] = []
+        self.requests_total = 0
+        self._tokens = 0
+
+    def add_tweet(self, tweet_id: str, community_id: Optional[str]) -> None:
+        self.stats[tweet_id] = [self.random.randrange(1000), 0, 0, 0, 0, 0]
+        if community_id:
+            self.communities[community_id].append(tweet_id)
+
+    def take_deleted(self) -> List[str]:
+        deleted, self._new_deleted = self._new_deleted, []
+        return deleted
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/1.1/guest/activate.json", self.guest_token)
+        app.router.add_get("/graphql/{query_id}/TweetResultByRestId", self.tweet)
+        app.router.add_get(
+            "/graphql/{query_id}/CommunityTweetsRankedLoggedOutTimeline",
+            self.timeline,
+        )
+        return app
+
+    async def guest_token(self, request: web.Request) -> web.Response:
+        self.requests_total += 1
+        self._tokens += 1
+        return web.json_response({"guest_token": f"soak{self._tokens}"})
+
+    async def tweet(self, request: web.Request) -> web.Response:
+        self.requests_total += 1
+        tweet_id = json.loads(request.query["variables"])["tweetId"]
+        stats = self.stats.get(tweet_id)
+        if stats is not None and tweet_id not in self.deleted:
+            if self.random.random() < self.delete_rate:
+                self.deleted.add(tweet_id)
+                self._new_deleted.append(tweet_id)
+        if stats is None or tweet_id in self.deleted:
+            return web.json_response({"data": {"tweetResult": {}}})
+        stats[0] += self.random.randrange(50)
+        for metric in range(1, len(stats)):
+            stats[metric] += int(self.random.random() < 0.3)
+        views, bookmarks, favorites, retweets, quotes, replies = stats
+        result = {
+            "views": {"count": str(views)},
+            "legacy": {
+                "bookmark_count": bookmarks,
+                "favorite_count": favorites,
+                "retweet_count": retweets,
+                "quote_count": quotes,
+                "reply_count": replies,
+            },
+        }
+        return web.json_response({"data": {"tweetResult": {"result": result}}})
+
+    async def timeline(self, request: web.Request) -> web.Response:
+        self.requests_total += 1
+        variables = json.loads(request.query["variables"])
+        community_id = variables["communityId"]
+        count = int(variables.get("count", 20))
+        offset = int(variables.get("cursor") or 0)
+
+        self._rotation[community_id] += 1
+        ranked = [
+            tweet_id
+            for tweet_id in self.communities.get(community_id, ())
+            if tweet_id not in self.deleted
+        ]
+        if ranked:
+            shift = self._rotation[community_id] // TOP_ROTATE_REQUESTS % len(ranked)
+            ranked = ranked[shift:] + ranked[:shift]
+        page = ranked[offset : offset + count]
+        entries = [{"entryId": f"tweet-{tweet_id}"} for tweet_id in page]
+        if offset + count < len(ranked):
+            entries.append(
+                {
+                    "entryId": f"cursor-bottom-{offset + count}",
+                    "content": {"value": str(offset + count)},
+                }
+            )
+        timeline = {
+            "instructions": [{"type": "TimelineAddEntries", "entries": entries}]
+        }
+        return web.json_response(
+            {
+                "data": {
+                    "communityResults": {
+                        "result": {"ranked_community_timeline": {"timeline": timeline}}
+                    }
+                }
+            }
+        )
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.messages_total = 0
+        self.requests_total = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.method)
+        return app
+
+    async def method(self, request: web.Request) -> web.Response:
+        self.requests_total += 1
+        await request.read()
+        method = request.match_info["method"]
+        if method == "sendMessage":
+            self.messages_total += 1
+            result = {
+                "message_id": self.messages_total,
+                "date": 0,
+                "chat": {"id": 0, "type": "private"},
+            }
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "soak"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+async def serve(app: web.Application, port: int = 0) -> Tuple[web.AppRunner, int]:
+    """Serve app on 127.0.0.1, returns the runner and the bound port."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
@@ -0,0 +1,105 @@
+"""
+Import-time and startup benchmark of the process entry points.
+
+Every entry module is imported in a fresh interpreter with -X importtime,
+which reports the median total and the heaviest packages it pulls in.
+With --db the startup steps that touch the database are timed as well,
+against DB_URL:
+
+    python -m core.utils.startup_bench
+    python -m core.utils.startup_bench --repeat 5 --db
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENTRY_MODULES = ("bot", "checker", "main")
+# Packages listed per entry module
+TOP_PACKAGES = 8
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """Seconds to import module, and the cumulative seconds per top-level package."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        seconds = int(cumulative) / 1e6
+        package = name.strip().split(".")[0]
+        if name.strip() == module:
+            total = seconds
+        elif package != module:
+            # The outermost import of a package has the largest cumulative time
+            packages[package] = max(packages.get(package, 0.0), seconds)
+    return total, packages
+
+
+def bench_imports(repeat: int) -> None:
+    print(f"Import time, median of {repeat}:")
+    for module in ENTRY_MODULES:
+        totals: List[float] = []
+        packages: Dict[str, float] = {}
+        for _ in range(repeat):
+            total, packages = measure_import(module)
+            totals.append(total)
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])
+        print(f"  {module:<8} {statistics.median(totals) * 1000:8.0f} ms")
+        for package, seconds in heaviest[:TOP_PACKAGES]:
+            print(f"    {package:<24} {seconds * 1000:8.0f} ms")
+
+
+async def bench_startup() -> None:
+    from config import DB_URL
+    from core.db.database_handler import DatabaseHandler
+    from core.services.app_config import app_config
+
+    steps: List[Tuple[str, float]] = []
+    db = DatabaseHandler(DB_URL)
+    try:
+        for label in ("db.init (first)", "db.init (current)"):
+            started = time.perf_counter()
+            await db.init()
+            steps.append((label, time.perf_counter() - started))
+        started = time.perf_counter()
+        await app_config.start(db)
+        steps.append(("app_config.start", time.perf_counter() - started))
+        await app_config.stop()
+    finally:
+        await db.close()
+    print("Startup steps:")
+    for label, seconds in steps:
+        print(f"  {label:<24} {seconds * 1000:8.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m core.utils.startup_bench")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--db", action="store_true", help="Also time the database startup steps"
+    )
+    args = parser.parse_args()
+    bench_imports(args.repeat)
+    if args.db:
+        asyncio.run(bench_startup())
+
+
+if __name__ == "__main__":
+    main()
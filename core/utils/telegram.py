@@ -1,14 +1,41 @@
-from aiogram.client.session import aiohttp
+import asyncio
+import json
+import time
 
-from config import BOT_TOKEN
+import aiohttp
+
+from config import BOT_TOKEN, TELEGRAM_API_URL
+from core.services.app_config import app_config
+from core.utils.cassette import Recorded, get_cassette
+
+# Earliest monotonic time the next message may be sent at
+_next_send_at = 0.0
+
+
+async def throttle() -> None:
+    """Space out sendMessage calls by the live telegram_messages_per_second."""
+    global _next_send_at
+    interval = 1 / app_config["telegram_messages_per_second"]
+    now = time.monotonic()
+    send_at = max(now, _next_send_at)
+    _next_send_at = send_at + interval
+    if send_at > now:
+        await asyncio.sleep(send_at - now)
 
 
 async def send_message(chat_id: str, text: str):
+    await throttle()
+    url = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/sendMessage"
     message_data = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-            json=message_data,
-        ) as response:
-            json_data = await response.json()
-            return json_data
+
+    async def send() -> Recorded:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=message_data) as response:
+                return Recorded(response.status, await response.read())
+
+    cassette = get_cassette()
+    if cassette is None:
+        recorded = await send()
+    else:
+        recorded = await cassette.fetch("POST", url, None, send)
+    return json.loads(recorded.content)
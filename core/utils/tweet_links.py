@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import codecs
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Iterable, List, Optional, Set, Tuple
+
+TWEET_ID_RE = re.compile(r"/status(?:es)?/(\d+)")
+COMMUNITY_ID_RE = re.compile(r"/communities/(\d+)")
+URL_RE = re.compile(r"https?://\S+")
+# Separators used in plain lists and CSV exports
+TOKEN_SPLIT_RE = re.compile(r"[\s,;\"']+")
+# Tweet ids are snowflakes: milliseconds since this epoch, shifted left by 22
+SNOWFLAKE_EPOCH_MS = 1288834974657
+
+
+def tweet_created_at(tweet_id: str) -> Optional[float]:
+    """Unix time the tweet was posted, decoded from its id."""
+    if not tweet_id.isdigit():
+        return None
+    return ((int(tweet_id) >> 22) + SNOWFLAKE_EPOCH_MS) / 1000
+
+
+@dataclass
+class TweetLink:
+    tweet_url: str
+    tweet_id: str
+    community_id: Optional[str] = None
+
+
+@dataclass
+class ParsedLinks:
+    links: List[TweetLink] = field(default_factory=list)
+    invalid: List[str] = field(default_factory=list)
+
+    @property
+    def tweet_ids(self) -> List[str]:
+        return list(dict.fromkeys(link.tweet_id for link in self.links))
+
+
+class TweetLinkParser:
+    """
+    Incremental parser for lists of tweet URLs.
+
+    Every tweet URL starts a new link; a community URL right after it on the
+    same line sets that link's community. Lines can be fed one by one, so large uploads are
+    parsed without holding the whole file in memory. Links are deduplicated
+    by (tweet_id, community_id).
+    """
+
+    def __init__(self) -> None:
+        self.result = ParsedLinks()
+        self._seen: Set[Tuple[str, Optional[str]]] = set()
+        self._last: Optional[TweetLink] = None
+
+    def feed_line(self, line: str) -> None:
+        for token in TOKEN_SPLIT_RE.split(line):
+            if token:
+                self._feed_token(token)
+        self._flush()
+
+    def _feed_token(self, token: str) -> None:
+        tweet_match = TWEET_ID_RE.search(token)
+        if tweet_match:
+            self._flush()
+            self._last = TweetLink(tweet_url=token, tweet_id=tweet_match.group(1))
+            return
+
+        community_match = COMMUNITY_ID_RE.search(token)
+        if community_match and self._last and self._last.community_id is None:
+            self._last.community_id = community_match.group(1)
+            self._flush()
+            return
+
+        # Headers and other CSV columns are only reported when they look like links
+        if URL_RE.match(token) or community_match:
+            self.result.invalid.append(token)
+
+    def _flush(self) -> None:
+        link, self._last = self._last, None
+        if link is None:
+            return
+        key = (link.tweet_id, link.community_id)
+        if key not in self._seen:
+            self._seen.add(key)
+            self.result.links.append(link)
+
+    def close(self) -> ParsedLinks:
+        self._flush()
+        return self.result
+
+
+def parse_tweet_links(lines: Iterable[str]) -> ParsedLinks:
+    parser = TweetLinkParser()
+    for line in lines:
+        parser.feed_line(line)
+    return parser.close()
+
+
+async def parse_tweet_links_stream(chunks: AsyncIterable[bytes]) -> ParsedLinks:
+    """Parse an uploaded file chunk by chunk, decoding it as UTF-8."""
+    parser = TweetLinkParser()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            parser.feed_line(line)
+    parser.feed_line(tail + decoder.decode(b"", final=True))
+    return parser.close()
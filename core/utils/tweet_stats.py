@@ -0,0 +1,26 @@
+# Keys of the stats dicts returned by extract_tweet_stats, in column order
+METRICS = (
+    "views_count",
+    "favorite_count",
+    "retweet_count",
+    "reply_count",
+    "bookmark_count",
+    "quote_count",
+)
+# Metric names accepted by /alert
+METRIC_NAMES = {
+    "views": "views_count",
+    "likes": "favorite_count",
+    "retweets": "retweet_count",
+    "replies": "reply_count",
+    "bookmarks": "bookmark_count",
+    "quotes": "quote_count",
+}
+METRIC_LABELS = {
+    "views_count": "👁",
+    "favorite_count": "❤️",
+    "retweet_count": "🔁",
+    "reply_count": "💬",
+    "bookmark_count": "🔖",
+    "quote_count": "🗨",
+}
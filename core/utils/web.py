@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import signal
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+from aiohttp import web
+from loguru import logger
+
+from config import WEB_HOST, WEB_PORT
+from core.db.database_handler import DatabaseHandler
+from core.utils.logs import EventLogger
+
+if TYPE_CHECKING:
+    # aiogram alone takes seconds to import, the checker process never needs it
+    from aiogram import Bot, Dispatcher
+
+    from core.services.checker import Checker
+
+# Seconds /healthz waits for the database before reporting it down
+HEALTH_DB_TIMEOUT = 3
+# Sampled by the "health_check_failed" rate of core.utils.logs
+health_failed_log = EventLogger("health_check_failed")
+
+
+def format_metrics(db: DatabaseHandler, checker: Optional[Checker]) -> str:
+    """Render counters in the Prometheus text exposition format."""
+    samples = [("user_cache_entries", "gauge", len(db.user_cache))]
+    if checker is not None:
+        limiter = checker.engine.limiter
+        communities = checker.engine.communities
+        budget = checker.engine.budget
+        samples += [
+            ("checker_ticks_total", "counter", checker.ticks_total),
+            ("checker_tick_failures_total", "counter", checker.tick_failures_total),
+            (
+                "checker_last_tick_duration_seconds",
+                "gauge",
+                checker.last_tick_duration,
+            ),
+            (
+                "checker_last_tick_timestamp_seconds",
+                "gauge",
+                checker.last_tick_finished_at,
+            ),
+            ("checker_tracked_tweets", "gauge", checker.tracked_tweets),
+            ("checker_state_entries", "gauge", len(checker.state_store)),
+            ("growth_tracked_tweets", "gauge", len(checker.growth)),
+            ("tweet_index_reloads_total", "counter", checker.tweet_index.reloads_total),
+            (
+                "tweet_index_mismatches_total",
+                "counter",
+                checker.tweet_index.mismatches_total,
+            ),
+            ("community_tops_polled_total", "counter", communities.polled_total),
+            ("community_tops_reused_total", "counter", communities.reused_total),
+            ("community_tops_changed_total", "counter", communities.changed_total),
+            ("budget_shed_tweet_stats_total", "counter", budget.shed_stats_total),
+            ("budget_shed_crawl_pages_total", "counter", budget.shed_pages_total),
+            ("budget_last_tick_shed_tweets", "gauge", len(budget.last_plan.shed)),
+            (
+                "budget_last_tick_stats_requests",
+                "gauge",
+                budget.last_plan.stats_requests,
+            ),
+            (
+                "budget_last_tick_community_requests",
+                "gauge",
+                budget.last_plan.community_requests,
+            ),
+            ("budget_requests_per_tick", "gauge", budget.limit() or 0),
+            ("fetch_requests_active", "gauge", limiter.active),
+            ("fetch_requests_waiting", "gauge", limiter.waiting),
+        ]
+    lines: List[str] = []
+    for name, kind, value in samples:
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    if checker is not None and checker.profiler.last_stages:
+        for clock in ("wall", "cpu"):
+            name = f"checker_last_tick_stage_{clock}_seconds"
+            lines.append(f"# TYPE {name} gauge")
+            for stage, timings in checker.profiler.last_stages.items():
+                lines.append(f'{name}{{stage="{stage}"}} {timings[clock]}')
+    return "\n".join(lines) + "\n"
+
+
+def create_web_app(
+    db: DatabaseHandler,
+    checker: Optional[Checker] = None,
+    dp: Optional[Dispatcher] = None,
+    bot: Optional[Bot] = None,
+    webhook_path: Optional[str] = None,
+    webhook_secret: Optional[str] = None,
+) -> web.Application:
+    """
+    Build the aiohttp app with /healthz and /metrics; checker metrics are
+    only reported by the process that runs the checker.
+
+    With webhook_path set, Telegram updates posted there are fed to the
+    dispatcher; requests without the matching secret token are rejected.
+    """
+    app = web.Application()
+
+    async def healthz(request: web.Request) -> web.Response:
+        body = {"status": "ok"}
+        if checker is not None and checker.last_tick_finished_at:
+            body["last_tick_age_seconds"] = round(
+                time.time() - checker.last_tick_finished_at, 1
+            )
+        try:
+            await asyncio.wait_for(db.ping(), HEALTH_DB_TIMEOUT)
+        except Exception as e:
+            health_failed_log.warning("Health check failed: {error}", error=e)
+            body["status"] = "db unavailable"
+            return web.json_response(body, status=503)
+        return web.json_response(body)
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=format_metrics(db, checker),
+            content_type="text/plain",
+            charset="utf-8",
+        )
+
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+
+    if webhook_path:
+        from aiogram.webhook.aiohttp_server import (
+            SimpleRequestHandler,
+            setup_application,
+        )
+
+        SimpleRequestHandler(
+            dispatcher=dp, bot=bot, secret_token=webhook_secret
+        ).register(app, path=webhook_path)
+        # Runs the dispatcher's startup/shutdown hooks with the app
+        setup_application(app, dp, bot=bot)
+
+    return app
+
+
+async def start_web_app(app: web.Application) -> web.AppRunner:
+    port = int(WEB_PORT or 8080)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEB_HOST, port).start()
+    logger.info(f"Web app listening on {WEB_HOST}:{port}")
+    return runner
+
+
+async def wait_for_shutdown() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Not available on Windows, Ctrl+C still cancels the main task there
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
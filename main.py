@@ -1,44 +1,60 @@
 import asyncio
 
-from aiogram import Bot, Dispatcher
-from aiogram.types import BotCommand
 from loguru import logger
 
-from config import BOT_TOKEN, DB_URL
+from bot import run_bot
+from config import DB_URL, PARSE_WORKERS, RUN_MODE, STATE_SNAPSHOT_PATH, WARM_STATE_PATH
 from core.db.database_handler import DatabaseHandler
+from core.services.app_config import app_config
+from core.services.checker import Checker
+from core.services.community_crawler import CommunityCrawler
+from core.services.tweet_state import TweetStateStore
+from core.services.warm_state import WarmState
+from core.utils.cassette import install_from_config
+from core.utils.logs import setup_logging
 from core.utils.scheduler import scheduler
-from routers import commands
+from core.utils.x_community_checker import start_parse_pool, stop_parse_pool
 
 
 async def main() -> None:
-    logger.info("Starting bot")
-
-    scheduler.start()
-
-    dp = Dispatcher()
-    bot = Bot(token=BOT_TOKEN)
-    bot_data = await bot.get_me()
-    logger.info(
-        f"Bot started as {bot_data.first_name} with username {bot_data.username}"
-    )
+    """
+    Bot and checker in one process. For separate processes run
+    `python -m bot` and `python -m checker` instead.
+    """
+    setup_logging()
+    logger.info(f"Starting bot in {RUN_MODE} mode")
 
     db = DatabaseHandler(DB_URL)
 
     await db.init()
-
-    dp["db"] = db
-    dp.include_routers(
-        commands.router,
-    )
-
-    bot_commands = [
-        BotCommand(command="/start", description="Запуск / перезапуск бота 🚀"),
-    ]
-    await bot.set_my_commands(bot_commands)
-
-    logger.info("Bot commands set")
-    await logger.complete()
-    await dp.start_polling(bot)
+    await app_config.start(db)
+
+    state_store = TweetStateStore(STATE_SNAPSHOT_PATH)
+    state_store.load()
+    cassette = install_from_config()
+    start_parse_pool(PARSE_WORKERS)
+    checker = Checker(db, state_store)
+    crawler = CommunityCrawler(db, checker.engine)
+    warm_state = WarmState(WARM_STATE_PATH)
+    warm_state.load(checker, crawler)
+    # Polling and the first sweep do not wait for the session and token
+    warmup = asyncio.create_task(checker.engine.warm())
+    scheduler.start(checker, crawler)
+
+    try:
+        await run_bot(db, checker)
+    finally:
+        warmup.cancel()
+        await scheduler.stop()
+        await checker.close()
+        await warm_state.save(checker, crawler)
+        stop_parse_pool()
+        if cassette is not None:
+            cassette.close()
+        await app_config.stop()
+        await db.close()
+        # Flush the queued log records
+        await logger.complete()
 
 
 if __name__ == "__main__":
@@ -1,15 +1,75 @@
-import re
+from __future__ import annotations
+
+import asyncio
+import html
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, List, Optional, Union
 
 from aiogram import Router
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message
+from aiogram.types import FSInputFile, LinkPreviewOptions, Message
 
+from config import OPERATOR_IDS
 from core.db.database_handler import DatabaseHandler
+from core.db.tables import AlertRule, User
+from core.services.app_config import app_config
+from core.services.history_export import export_history
+from core.services.notifier import format_check_status
+from core.utils.tweet_links import (
+    ParsedLinks,
+    parse_tweet_links,
+    parse_tweet_links_stream,
+)
+from core.utils.tweet_stats import METRIC_LABELS, METRIC_NAMES
+
+if TYPE_CHECKING:
+    # The bot process only gets a RemoteChecker, see bot.main
+    from core.services.check_jobs import RemoteChecker
+    from core.services.checker import Checker
 
 router = Router()
 
+ADD_USAGE = (
+    "Добавить пост для отслеживания: `/add <tweet_url> <community_url>(необязательно)`\n"
+    "Можно несколько ссылок, по одной на строку, или файл .txt/.csv с подписью /add"
+)
+REMOVE_USAGE = (
+    "Перестать отслеживать пост: `/remove <tweet_url>`\n"
+    "Можно несколько ссылок или файл .txt/.csv с подписью /remove"
+)
+# How many unrecognised links are echoed back in the summary
+INVALID_LINKS_SHOWN = 5
+DIGEST_USAGE = (
+    "Присылать уведомления и статистику дайджестом: `/digest <минуты>`\n"
+    "Вернуть мгновенные уведомления: `/digest off`"
+)
+ALERT_USAGE = (
+    "Уведомить, когда у поста наберётся: `/alert <метрика> <порог>`\n"
+    "Уведомить о росте за период: `/alert <метрика> <прирост> <минуты>`\n"
+    "Метрики: views, likes, retweets, replies, bookmarks, quotes\n"
+    "Список правил: `/alert list`, удалить: `/alert del <id>`"
+)
+EXPORT_USAGE = (
+    "Выгрузить историю статистики за последние дни: `/export <дни> <parquet|arrow>`\n"
+    "Доступно только операторам из OPERATOR_IDS"
+)
+QUOTA_USAGE = (
+    "Квоты пользователя: `/quota <user_telegram_id> <постов> [секунд между проверками] [вес]`\n"
+    "0 постов — без лимита, `-` — значение по умолчанию. Свои квоты: `/quota`\n"
+    "Менять квоты могут только операторы из OPERATOR_IDS"
+)
+EXPORT_MAX_DAYS = 31
+# Telegram bots cannot send larger documents
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+# Up to this many added links the reply waits for their first check
+IMMEDIATE_CHECK_LIMIT = 5
+IMMEDIATE_CHECK_TIMEOUT = 15
+
 
 def strip_bot_suffix(text: str) -> str:
     """
@@ -19,6 +79,14 @@ def strip_bot_suffix(text: str) -> str:
     return text.split("@", 1)[0]
 
 
+async def ensure_access(message: Message, db: DatabaseHandler) -> bool:
+    """Answer non-admins with a refusal; backed by the cached user lookup."""
+    if await db.has_access(message.from_user.id):
+        return True
+    await message.answer("Нет доступа 🖕")
+    return False
+
+
 @router.message(Command("start"))
 async def start_command_handler(
     message: Message, db: DatabaseHandler, state: FSMContext
@@ -48,59 +116,124 @@ async def start_command_handler(
         "Привет! Кратко по использованию:\n\n"
         "Добавить пост для отслеживания: `/add <tweet_url> <community_url>(необязательно)`\n"
         "Перестать отслеживать: `/remove <tweet_url>`\n"
-        "Предоставить доступ к боту: `/allow <user_telegram_id>`",
+        "В /add и /remove можно передать много ссылок или файл .txt/.csv\n"
+        "Предоставить доступ к боту: `/allow <user_telegram_id>`\n"
+        "Присылать уведомления дайджестом: `/digest <минуты>` или `/digest off`\n"
+        "Уведомления о росте просмотров и лайков: `/alert`\n"
+        "Квоты на посты и частоту проверок: `/quota`\n"
+        "Выгрузить историю статистики: `/export <дни>`",
         parse_mode=ParseMode.MARKDOWN,
     )
 
 
-@router.message(Command("add"))
-async def add_command_handler(message: Message, db: DatabaseHandler, state: FSMContext):
-    command_data = message.text.split(" ")
-    if len(command_data) < 2:
-        await message.answer(
-            "Добавить пост для отслеживания: `/add <tweet_url> <community_url>(необязательно)`",
-            parse_mode=ParseMode.MARKDOWN,
+async def read_tweet_links(message: Message) -> ParsedLinks:
+    """
+    Collect tweet links from the message text or from an attached
+    .txt/.csv file, which is streamed and parsed line by line.
+    """
+    if message.document:
+        bot = message.bot
+        file = await bot.get_file(message.document.file_id)
+        url = bot.session.api.file_url(bot.token, file.file_path)
+        return await parse_tweet_links_stream(bot.session.stream_content(url))
+    return parse_tweet_links((message.text or "").splitlines())
+
+
+def format_bulk_summary(title: str, lines: List[str], parsed: ParsedLinks) -> str:
+    if parsed.invalid:
+        lines.append(f"Не распознано: {len(parsed.invalid)}")
+        lines.extend(html.escape(link) for link in parsed.invalid[:INVALID_LINKS_SHOWN])
+    return "\n".join([title, *lines])
+
+
+async def first_check_status(check: asyncio.Task) -> str:
+    """Wait briefly for an on-demand check and describe its result."""
+    try:
+        tweets, result = await asyncio.wait_for(
+            asyncio.shield(check), IMMEDIATE_CHECK_TIMEOUT
         )
+    except asyncio.TimeoutError:
+        return "Первая проверка ещё идёт, об изменениях сообщу отдельно"
+    except Exception:
+        return "Не удалось проверить сейчас, проверю при следующем обходе"
+    return "\n".join(format_check_status(tweet, result) for tweet in tweets)
+
+
+@router.message(Command("add"))
+async def add_command_handler(
+    message: Message,
+    db: DatabaseHandler,
+    checker: Union[Checker, RemoteChecker],
+    state: FSMContext,
+):
+    if not await ensure_access(message, db):
+        return
+    parsed = await read_tweet_links(message)
+    if not parsed.links:
+        await message.answer(ADD_USAGE, parse_mode=ParseMode.MARKDOWN)
         return
-    tweet_url = command_data[1]
-    tweet_id = re.search(r"/status/(\d+)", tweet_url).group(1)
-    community_id = None
-    if len(command_data) == 3:
-        community_url = command_data[2]
-        community_id = re.search(r"/communities/(\d+)", community_url).group(1)
-
-    await db.add_tweet(
-        tweet_url=tweet_url,
-        tweet_id=tweet_id,
-        community_id=community_id,
+
+    user = await db.get_user(message.from_user.id)
+    added, skipped, accepted = await db.add_tweets(
         user_id=message.from_user.id,
+        links=[
+            (link.tweet_url, link.tweet_id, link.community_id) for link in parsed.links
+        ],
+        limit=max_tweets(user),
+    )
+    # New tweets are checked right away instead of waiting for the next sweep;
+    # links over the quota are not tracked and cost no requests
+    check = checker.enqueue(accepted) if accepted else None
+    lines = [
+        f"Добавлено: {added}",
+        f"Уже отслеживались: {len(parsed.links) - added - skipped}",
+    ]
+    if skipped:
+        lines.append(f"Сверх квоты ({max_tweets(user)} постов): {skipped}")
+    text = format_bulk_summary("Окей, будем следить! 🦈", lines, parsed)
+    if check is not None and len(accepted) <= IMMEDIATE_CHECK_LIMIT:
+        text += "\n\n" + await first_check_status(check)
+    await message.answer(
+        text,
+        parse_mode=ParseMode.HTML,
+        link_preview_options=LinkPreviewOptions(is_disabled=True),
     )
-    await message.answer("Окей, будем следить! 🦈")
 
 
 @router.message(Command("remove"))
-async def add_command_handler(message: Message, db: DatabaseHandler, state: FSMContext):
-    command_data = message.text.split(" ")
-    if len(command_data) < 2:
-        await message.answer(
-            "Перестать отслеживать пост: `/remove <tweet_url>`",
-            parse_mode=ParseMode.MARKDOWN,
-        )
+async def remove_command_handler(
+    message: Message, db: DatabaseHandler, state: FSMContext
+):
+    if not await ensure_access(message, db):
+        return
+    parsed = await read_tweet_links(message)
+    if not parsed.links:
+        await message.answer(REMOVE_USAGE, parse_mode=ParseMode.MARKDOWN)
         return
-    tweet_url = command_data[1]
-    tweet_id = re.search(r"/status/(\d+)", tweet_url).group(1)
 
-    await db.set_as_inactive(
-        tweet_id=tweet_id,
-        user_id=message.from_user.id,
+    removed = await db.remove_tweets(
+        user_id=message.from_user.id, tweet_ids=parsed.tweet_ids
+    )
+    await message.answer(
+        format_bulk_summary(
+            "Пока пока, пост! 🦈",
+            [
+                f"Удалено: {removed}",
+                f"Не отслеживались: {len(parsed.tweet_ids) - removed}",
+            ],
+            parsed,
+        ),
+        parse_mode=ParseMode.HTML,
+        link_preview_options=LinkPreviewOptions(is_disabled=True),
     )
-    await message.answer("Пока пока, пост! 🦈")
 
 
 @router.message(Command("allow"))
 async def invite_command_handler(
     message: Message, db: DatabaseHandler, state: FSMContext
 ):
+    if not await ensure_access(message, db):
+        return
     command_data = message.text.split(" ")
     if len(command_data) < 2:
         await message.answer(
@@ -111,6 +244,198 @@ async def invite_command_handler(
     user_to_allow_id = command_data[1]
 
     await db.update_user(user_tg_id=int(user_to_allow_id), is_admin=True)
+    await message.answer(f"Доступ выдан пользователю {user_to_allow_id}")
+
+
+@router.message(Command("digest"))
+async def digest_command_handler(
+    message: Message, db: DatabaseHandler, state: FSMContext
+):
+    if not await ensure_access(message, db):
+        return
+    command_data = (message.text or "").split()
+    argument = command_data[1].lower() if len(command_data) > 1 else ""
+
+    if argument == "off":
+        await db.update_user(message.from_user.id, digest_interval_minutes=None)
+        await message.answer("Дайджест выключен, уведомления будут приходить сразу")
+        return
+    if not argument.isdigit() or int(argument) < 1:
+        await message.answer(DIGEST_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+
+    await db.update_user(
+        message.from_user.id, digest_interval_minutes=int(argument), digest_sent_at=None
+    )
+    await message.answer(f"Окей, дайджест раз в {int(argument)} мин. 📊")
+
+
+def max_tweets(user: User) -> Optional[int]:
+    """The user's tracked tweet quota, None if unlimited."""
+    limit = user.max_tweets
+    if limit is None:
+        limit = app_config["user_max_tweets"]
+    return limit or None
+
+
+async def format_quota(db: DatabaseHandler, user: User) -> str:
+    tracked = await db.count_tracked_tweets(user.user_tg_id)
+    limit = max_tweets(user)
+    interval = user.check_interval_seconds
+    return (
+        f"Постов: {tracked} из {limit or '∞'}\n"
+        f"Проверка: {f'не чаще раза в {interval} сек.' if interval else 'каждый обход'}\n"
+        f"Вес в очереди проверок: {user.fetch_weight}"
+    )
+
+
+def parse_quota_value(value: str, minimum: int) -> Union[int, None, bool]:
+    """A number of at least minimum, None for "-", False if invalid."""
+    if value == "-":
+        return None
+    if value.isdigit() and int(value) >= minimum:
+        return int(value)
+    return False
+
+
+@router.message(Command("quota"))
+async def quota_command_handler(
+    message: Message, db: DatabaseHandler, state: FSMContext
+):
+    if not await ensure_access(message, db):
+        return
+    args = (message.text or "").split()[1:]
+    if not args:
+        user = await db.get_user(message.from_user.id)
+        await message.answer(await format_quota(db, user))
+        return
+    if message.from_user.id not in OPERATOR_IDS:
+        await message.answer("Менять квоты могут только операторы")
+        return
+
+    values = [
+        parse_quota_value(value, minimum)
+        for value, minimum in zip(args[1:4], (0, 1, 1))
+    ]
+    if not args[0].isdigit() or not values or any(v is False for v in values):
+        await message.answer(QUOTA_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+    changes = dict(
+        zip(("max_tweets", "check_interval_seconds", "fetch_weight"), values)
+    )
+    # The weight has no "unset" state
+    if changes.get("fetch_weight", 1) is None:
+        changes["fetch_weight"] = 1
+    user = await db.update_user(int(args[0]), **changes)
+    if user is None:
+        await message.answer("Пользователь не найден")
+        return
     await message.answer(
-        f"Доступ выдан пользователю {user_to_allow_id}"
+        f"Квоты пользователя {user.user_tg_id}:\n{await format_quota(db, user)}"
+    )
+
+
+def format_alert_rule(rule: AlertRule) -> str:
+    label = METRIC_LABELS[rule.metric]
+    if rule.window_minutes:
+        return f"#{rule.id}: {label} +{rule.threshold} за {rule.window_minutes} мин."
+    return f"#{rule.id}: {label} от {rule.threshold}"
+
+
+@router.message(Command("alert"))
+async def alert_command_handler(
+    message: Message, db: DatabaseHandler, state: FSMContext
+):
+    if not await ensure_access(message, db):
+        return
+    args = (message.text or "").split()[1:]
+    action = args[0].lower() if args else ""
+
+    if action == "list":
+        rules = await db.get_alert_rules(message.from_user.id)
+        if not rules:
+            await message.answer("Правил пока нет")
+            return
+        await message.answer("\n".join(format_alert_rule(rule) for rule in rules))
+        return
+    if action == "del":
+        if len(args) < 2 or not args[1].lstrip("#").isdigit():
+            await message.answer(ALERT_USAGE, parse_mode=ParseMode.MARKDOWN)
+            return
+        deleted = await db.delete_alert_rule(
+            message.from_user.id, int(args[1].lstrip("#"))
+        )
+        await message.answer("Правило удалено" if deleted else "Правило не найдено")
+        return
+
+    numbers = args[1:3]
+    if (
+        action not in METRIC_NAMES
+        or not numbers
+        or not all(number.isdigit() and int(number) > 0 for number in numbers)
+    ):
+        await message.answer(ALERT_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+    rule = await db.add_alert_rule(
+        message.from_user.id,
+        METRIC_NAMES[action],
+        int(numbers[0]),
+        int(numbers[1]) if len(numbers) > 1 else None,
     )
+    await message.answer(f"Окей, правило добавлено 📈\n{format_alert_rule(rule)}")
+
+
+@router.message(Command("export"))
+async def export_command_handler(
+    message: Message, db: DatabaseHandler, state: FSMContext
+):
+    if not await ensure_access(message, db):
+        return
+    # The history covers the tweets of every user
+    if message.from_user.id not in OPERATOR_IDS:
+        await message.answer("Выгружать историю могут только операторы")
+        return
+    args = (message.text or "").split()[1:]
+    days = args[0] if args else "1"
+    fmt = args[1].lower() if len(args) > 1 else "parquet"
+    if (
+        not days.isdigit()
+        or not 1 <= int(days) <= EXPORT_MAX_DAYS
+        or fmt
+        not in (
+            "parquet",
+            "arrow",
+        )
+    ):
+        await message.answer(EXPORT_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+
+    until = date.today()
+    since = until - timedelta(days=int(days) - 1)
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            paths = await export_history(
+                db, os.path.join(directory, "history"), since, until, fmt
+            )
+        except RuntimeError as e:
+            await message.answer(str(e))
+            return
+        if not paths:
+            await message.answer("За эти дни истории нет")
+            return
+        archive = await asyncio.to_thread(
+            shutil.make_archive,
+            os.path.join(directory, f"history-{since}-{until}"),
+            "zip",
+            os.path.join(directory, "history"),
+        )
+        if os.path.getsize(archive) > EXPORT_MAX_BYTES:
+            await message.answer(
+                "Выгрузка больше 50 МБ, используйте "
+                "`python -m core.services.history_export`",
+                parse_mode=ParseMode.MARKDOWN,
+            )
+            return
+        await message.answer_document(
+            FSInputFile(archive), caption=f"История за {since} — {until}"
+        )